@@ -1,20 +1,60 @@
+import logging
+import os
+import threading
 import dash
-from dash import html, dcc
+import flask
+from dash import html, dcc, Patch, no_update
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 from dotenv import load_dotenv
 
-from core.utils import process_uploaded_files, extract_text_from_pdf, split_text
+from core import metrics
+from core.utils import extract_pages_from_pdf, split_text
 from core.embedding import EmbeddingManager
 from core.chatbot import Chatbot
+from core.jobs import JobManager, FINISHED_STATES
+from core.sessions import ChatSessionStore
+from core.streams import StreamRegistry
+from core.uploads import UploadStore
 from ui.templates import create_landing_page, create_upload_page, create_chat_page
 
 load_dotenv()
 
-# Initialize components
+logger = logging.getLogger(__name__)
+
+# Initialize components; the model and API clients load on first use
 embedding_manager = EmbeddingManager()
 chatbot = Chatbot(embedding_manager)
+streams = StreamRegistry()
+sessions = ChatSessionStore()
+uploads = UploadStore()
+jobs = JobManager(embedding_manager, extract_pages_from_pdf, split_text)
+warm_up_error = None
+warm_up_thread = None
+warm_up_lock = threading.Lock()
+
+def warm_up():
+    global warm_up_error
+    try:
+        chatbot.warm_up()
+        logger.info("Models and clients loaded")
+        # Here rather than at import, so importing app.py starts no ingestion
+        jobs.recover()
+    except Exception as e:
+        warm_up_error = str(e)
+        logger.error(f"Warm-up failed: {e}")
+
+def start_warm_up():
+    """Loads the model in the background (once) so pages are served while it loads."""
+    global warm_up_thread
+    with warm_up_lock:
+        if warm_up_thread is None:
+            warm_up_thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+            warm_up_thread.start()
+
+if os.getenv('WARMUP_ON_START', '1') == '1':
+    start_warm_up()
 
 # Initialize Dash app
 app = dash.Dash(__name__, 
@@ -22,60 +62,153 @@ app = dash.Dash(__name__,
                     dbc.themes.BOOTSTRAP,
                     'https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap'
                 ],
+                external_scripts=['/ui/upload.js'],
                 suppress_callback_exceptions=True)
 
+@app.server.route('/ready')
+def ready():
+    """
+    Readiness probe: 200 once the model and clients are loaded, 503 until then.
+
+    With WARMUP_ON_START=0 the first probe starts loading them, since a load
+    balancer gated on this route never sends the request that would.
+    """
+    if chatbot.is_ready:
+        return {'status': 'ready'}, 200
+    start_warm_up()
+    return {'status': 'failed' if warm_up_error else 'loading', 'error': warm_up_error}, 503
+
+@app.server.route('/metrics')
+def stage_metrics():
+    """Per-stage latency histograms in the Prometheus text format (empty unless METRICS=1)."""
+    return metrics.registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.server.route('/ui/upload.js')
+def upload_script():
+    return flask.send_from_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui'), 'upload.js')
+
+@app.server.route('/uploads', methods=['POST'])
+def create_upload():
+    """Starts a chunked upload of {"filename", "size"}; returns its ID."""
+    body = flask.request.get_json(silent=True) or {}
+    try:
+        upload_id = uploads.create(body.get('filename'), body.get('size'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    return {'id': upload_id, 'offset': 0}, 201
+
+@app.server.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Returns how many bytes of an upload have arrived, so a client can resume it."""
+    info = uploads.info(upload_id)
+    if info is None:
+        return {'error': "Unknown upload"}, 404
+    return info, 200
+
+@app.server.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Appends the raw request body at ?offset=; 409 with the current offset if it does not match."""
+    offset = flask.request.args.get('offset', type=int)
+    try:
+        offset = uploads.write(upload_id, offset, flask.request.stream)
+    except KeyError:
+        return {'error': "Unknown upload"}, 404
+    except ValueError as e:
+        info = uploads.info(upload_id)
+        return {'error': str(e), 'offset': info['offset'] if info else 0}, 409
+    return {'offset': offset}, 200
+
+@app.server.route('/ingest-jobs', methods=['POST'])
+def submit_uploads():
+    """Queues an ingestion job for finished uploads: {"uploads": [IDs], "session": session ID, "collection": name}."""
+    body = flask.request.get_json(silent=True) or {}
+    upload_ids = body.get('uploads') or []
+    try:
+        files = [uploads.completed_file(upload_id) for upload_id in upload_ids]
+    except KeyError as e:
+        return {'error': f"Unknown upload {e}"}, 404
+    except ValueError as e:
+        return {'error': str(e)}, 409
+    if not files:
+        return {'error': "No uploads given"}, 400
+
+    try:
+        namespace = embedding_manager.collections.namespace(body.get('collection') or os.getenv('UPLOAD_COLLECTION'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    job_id = jobs.submit(files, namespace, owner=body.get('session'))
+    for upload_id in upload_ids:
+        uploads.discard(upload_id)
+    return {'job_id': job_id}, 201
+
 # App layout
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
+    # Only the session ID lives in the browser; chat history and upload jobs are kept on the server
+    dcc.Store(id='session-id', storage_type='session'),
     html.Div(id='page-content'),
     create_landing_page(),
     create_upload_page(),
-    create_chat_page()
+    create_chat_page(embedding_manager.collections.names)
 ])
 
+@app.callback(
+    Output('upload-poll', 'disabled'),
+    Input('upload-submitted', 'n_clicks'),
+    prevent_initial_call=True
+)
+def start_polling(n_clicks):
+    # Clicked by ui/upload.js once a job has been submitted for the uploaded files
+    return False
+
+def render_file_status(filename, entry):
+    if entry['status'] == 'ingested':
+        return f"✓ {filename}: {entry['chunks']} chunks processed", 'success'
+    if entry['status'] == 'skipped':
+        return f"✓ {filename}: unchanged, {entry['chunks']} chunks already indexed", 'success'
+    if entry['status'] == 'failed':
+        return f"✗ {filename}: {entry['error']}", 'danger'
+    if entry['status'] == 'processing':
+        return f"… {filename}: {entry['chunks']} chunks so far", 'info'
+    return f"… {filename}: queued", 'secondary'
+
 @app.callback(
     [Output('upload-results', 'children'),
-     Output('overall-progress', 'value')],
-    Input('upload-pdf', 'contents'),
-    State('upload-pdf', 'filename'),
+     Output('overall-progress', 'value'),
+     Output('upload-poll', 'disabled', allow_duplicate=True)],
+    Input('upload-poll', 'n_intervals'),
+    State('session-id', 'data'),
     prevent_initial_call=True
 )
-def update_output(contents_list, filenames_list):
-    if not contents_list:
-        raise PreventUpdate
-    
-    results, total_chunks = process_uploaded_files(
-        contents_list, 
-        filenames_list, 
-        lambda pdf_file: embedding_manager.process_pdfs_and_upload(
-            pdf_file, 
-            extract_text_from_pdf, 
-            split_text
-        )
-    )
+def poll_upload_jobs(n_intervals, session_id):
+    statuses = [status for status in (jobs.status(job_id) for job_id in jobs.jobs_for(session_id)) if status]
+    if not statuses:
+        return [], 0, True
     
     alerts = []
-    for result in results:
-        status_color = 'success' if result['status'] == 'success' else 'danger'
-        status_icon = '✓' if result['status'] == 'success' else '✗'
-        status_text = f"{result['chunks']} chunks processed" if result['status'] == 'success' else result['error']
-        
-        alerts.append(
-            dbc.Alert(
-                f"{status_icon} {result['filename']}: {status_text}",
-                color=status_color,
-                style={'marginBottom': '0.5rem'}
-            )
-        )
+    for status in statuses:
+        for filename, entry in status['files'].items():
+            text, color = render_file_status(filename, entry)
+            alerts.append(dbc.Alert(text, color=color, style={'marginBottom': '0.5rem'}))
+        if status['state'] == 'failed':
+            alerts.append(dbc.Alert(f"✗ Upload failed: {status['error']}", color='danger',
+                                    style={'marginBottom': '0.5rem'}))
+    
+    total_files = sum(status['total_files'] for status in statuses)
+    completed_files = sum(status['completed_files'] for status in statuses)
+    total_chunks = sum(status['chunks_processed'] for status in statuses)
+    chunks_per_second = sum(status['chunks_per_second'] for status in statuses
+                            if status['state'] == 'running')
+    finished = all(status['state'] in FINISHED_STATES for status in statuses)
     
-    summary = dbc.Alert(
-        f"Total: {total_chunks} chunks processed from {len(results)} files",
-        color='info',
-        style={'marginTop': '1rem'}
-    )
-    alerts.append(summary)
+    summary_text = f"Total: {total_chunks} chunks processed from {completed_files}/{total_files} files"
+    if not finished:
+        summary_text += f" ({chunks_per_second:.1f} chunks/s)"
+    alerts.append(dbc.Alert(summary_text, color='info', style={'marginTop': '1rem'}))
     
-    return alerts, 100
+    progress = 100 * completed_files / total_files if total_files else 100
+    return alerts, progress, finished
 
 @app.callback(
     [Output('landing-page', 'style'),
@@ -100,37 +233,79 @@ def update_page(upload_clicks, chat_clicks, back_clicks, back_chat_clicks):
     else:  # back buttons
         return {'display': 'block'}, {'display': 'none'}, {'display': 'none'}
 
+def render_message(role, text):
+    if role == 'user':
+        return html.Div(f"You: {text}", style={'marginBottom': '0.5rem', 'textAlign': 'right', 'color': '#4a90e2'})
+    return html.Div(f"AI: {text}", style={'marginBottom': '1rem', 'textAlign': 'left', 'color': '#2c3e50'})
+
 @app.callback(
     [Output('chat-history', 'children'),
-     Output('chat-input', 'value')],
+     Output('session-id', 'data')],
+    Input('session-id', 'modified_timestamp'),
+    State('session-id', 'data')
+)
+def restore_chat(modified_timestamp, session_id):
+    # The full history is sent only here, when the page is (re)loaded. A
+    # well-formed ID is kept even if its session expired, since upload jobs
+    # are listed under it too.
+    messages = sessions.messages(session_id)
+    if messages is None:
+        return [], sessions.create()
+    return [render_message(role, text) for role, text in messages], no_update
+
+@app.callback(
+    [Output('chat-history', 'children', allow_duplicate=True),
+     Output('chat-input', 'value'),
+     Output('chat-pending', 'children', allow_duplicate=True),
+     Output('chat-stream-id', 'data', allow_duplicate=True),
+     Output('chat-stream-poll', 'disabled', allow_duplicate=True)],
     [Input('chat-send', 'n_clicks')],
     [State('chat-input', 'value'),
-     State('chat-history', 'children')],
+     State('chat-stream-id', 'data'),
+     State('session-id', 'data'),
+     State('chat-collections', 'value')],
     prevent_initial_call=True
 )
-def update_chat(n_clicks, message, history):
-    if not message:
+def send_message(n_clicks, message, active_stream_id, session_id, collections):
+    # One answer streams at a time; the message stays in the input until then
+    if not message or active_stream_id or not session_id:
         raise PreventUpdate
-        
-    if not history:
-        history = []
-    elif isinstance(history, str):
-        history = [history]
-        
-    user_message = html.Div(
-        f"You: {message}", 
-        style={'marginBottom': '0.5rem', 'textAlign': 'right', 'color': '#4a90e2'}
-    )
-    
-    # Get response from chatbot
-    bot_response = chatbot.generate_response(message)
-    bot_message = html.Div(
-        f"AI: {bot_response}",
-        style={'marginBottom': '1rem', 'textAlign': 'left', 'color': '#2c3e50'}
-    )
-    
-    history.extend([user_message, bot_message])
-    return history, ''
+
+    sessions.append(session_id, 'user', message)
+
+    # Stream the response from the chatbot into a server-side buffer polled below
+    stream_id = streams.start(chatbot.generate_response_stream(message, collections or None))
+
+    # Only the new message is sent; the browser appends it to the history it has
+    history = Patch()
+    history.append(render_message('user', message))
+    return history, '', "AI: ", stream_id, False
+
+@app.callback(
+    [Output('chat-pending', 'children', allow_duplicate=True),
+     Output('chat-history', 'children', allow_duplicate=True),
+     Output('chat-stream-id', 'data', allow_duplicate=True),
+     Output('chat-stream-poll', 'disabled', allow_duplicate=True)],
+    Input('chat-stream-poll', 'n_intervals'),
+    [State('chat-stream-id', 'data'),
+     State('session-id', 'data')],
+    prevent_initial_call=True
+)
+def poll_stream(n_intervals, stream_id, session_id):
+    buffer = streams.get(stream_id) if stream_id else None
+    if buffer is None:
+        return '', no_update, None, True
+
+    done = buffer.done
+    text = buffer.text()
+    if not done:
+        return f"AI: {text}", no_update, no_update, no_update
+
+    streams.discard(stream_id)
+    sessions.append(session_id, 'assistant', text)
+    history = Patch()
+    history.append(render_message('assistant', text))
+    return '', history, None, True
 
 if __name__ == '__main__':
     app.run_server(debug=False, dev_tools_ui=False)
\ No newline at end of file
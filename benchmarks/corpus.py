@@ -0,0 +1,111 @@
+import os
+import random
+
+VOCABULARY = """
+patients cohort randomized trial placebo dose response efficacy safety adverse events baseline
+follow-up outcome mortality survival hazard ratio confidence interval significant analysis
+protein expression gene mutation pathway receptor kinase inhibitor signaling cell line tumor
+cancer breast lung colorectal metastasis chemotherapy radiotherapy immunotherapy antibody
+infection bacterial viral antibiotic resistance vaccine immune response inflammation cytokine
+interleukin IL-6 TNF BRCA1 TP53 EGFR HER2 KRAS mRNA sequencing genome transcriptome proteomics
+diabetes insulin glucose obesity cardiovascular hypertension stroke myocardial infarction
+kidney liver lung brain neuronal cognitive dementia Alzheimer Parkinson depression anxiety
+model regression logistic multivariate cohort prospective retrospective observational meta-analysis
+systematic review sample size power statistical method data measurement assay laboratory clinical
+""".split()
+
+BOILERPLATE = (
+    "This is an open access article distributed under the terms of the Creative Commons Attribution "
+    "License, which permits unrestricted use, distribution, and reproduction in any medium, provided "
+    "the original author and source are properly credited."
+)
+
+
+def sentence(rng, min_words=8, max_words=18):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(min_words, max_words))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def page_lines(rng, lines_per_page, line_width=90):
+    """Wraps random sentences into lines of at most line_width characters."""
+    lines = []
+    current = ''
+    while len(lines) < lines_per_page:
+        for word in sentence(rng).split():
+            if len(current) + len(word) + 1 > line_width:
+                lines.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+    return lines[:lines_per_page]
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(pages):
+    """Builds a minimal PDF (Helvetica text, one content stream per page) from lists of lines."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    page_refs = []
+    for lines in pages:
+        text = ''.join(f"({_escape(line)}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 750 Td {text}ET".encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b' '.join(page_refs), len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+def generate_corpus(directory, documents=50, pages_per_document=5, lines_per_page=40,
+                    duplicate_fraction=0.1, seed=0):
+    """
+    Writes a reproducible corpus of synthetic PDFs to directory.
+
+    Every document starts with the same license boilerplate, and about
+    duplicate_fraction of the documents are exact copies of earlier ones, as
+    with papers mirrored in both the PMC and NLM trees. Returns the corpus
+    description: file count, page count and a sample of sentences from the
+    text, which make queries that have relevant matches.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    sample_sentences = []
+    for index in range(documents):
+        if written and rng.random() < duplicate_fraction:
+            pdf = rng.choice(written)
+        else:
+            pages = [page_lines(rng, lines_per_page) for _ in range(pages_per_document)]
+            pages[0] = [BOILERPLATE[:90], BOILERPLATE[90:180], BOILERPLATE[180:]] + pages[0][3:]
+            for lines in pages:
+                start = rng.randrange(len(lines) - 3)
+                sample_sentences.append(' '.join(lines[start:start + 3]))
+            pdf = make_pdf(pages)
+            written.append(pdf)
+        with open(os.path.join(directory, f"synthetic-{index:05d}.pdf"), 'wb') as f:
+            f.write(pdf)
+    return {
+        'documents': documents,
+        'pages': documents * pages_per_document,
+        'sample_sentences': sample_sentences
+    }
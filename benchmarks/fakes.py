@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+import numpy as np
+
+from core.llm import LLM
+from core.vector_store import VectorStore
+
+
+class RateLimitError(Exception):
+    """Raised by the fakes like a client error for HTTP 429."""
+
+    def __init__(self, message="429 Too Many Requests"):
+        super().__init__(message)
+        self.status = 429
+
+
+class TokenBucket:
+    """Allows rate requests per second with bursts of up to burst requests."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Latency:
+    """Sleeps for a mean delay with multiplicative jitter, from a seeded generator."""
+
+    def __init__(self, mean_seconds, jitter=0.25, seed=0):
+        self.mean_seconds = mean_seconds
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sleep(self, scale=1.0):
+        if self.mean_seconds <= 0:
+            return
+        with self.lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+        time.sleep(self.mean_seconds * scale * factor)
+
+
+class FakePineconeVectorStore(VectorStore):
+    """
+    In-memory VectorStore with Pinecone-like request latency and rate limits.
+
+    Requests beyond requests_per_second raise RateLimitError (status 429),
+    which the upsert client retries. Queries are exact cosine searches.
+    """
+
+    def __init__(self, upsert_latency=0.05, query_latency=0.03, requests_per_second=None, seed=0):
+        self.upsert_latency = Latency(upsert_latency, seed=seed)
+        self.query_latency = Latency(query_latency, seed=seed + 1)
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.namespaces = {}
+        self.matrices = {}
+        self.lock = threading.Lock()
+        self.rate_limited = 0
+
+    def _admit(self):
+        if self.bucket and not self.bucket.try_acquire():
+            with self.lock:
+                self.rate_limited += 1
+            raise RateLimitError()
+
+    def upsert(self, vectors, namespace="ns1"):
+        self._admit()
+        # Latency grows with request size, as it does for real upserts
+        self.upsert_latency.sleep(max(1.0, len(vectors) / 100))
+        with self.lock:
+            records = self.namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                values = np.asarray(vector['values'], dtype=np.float32)
+                records[vector['id']] = (values / max(float(np.linalg.norm(values)), 1e-12),
+                                         vector.get('metadata') or {})
+            self.matrices.pop(namespace, None)
+
+    def _matrix(self, namespace):
+        with self.lock:
+            if namespace not in self.matrices:
+                records = self.namespaces.get(namespace, {})
+                ids = list(records)
+                matrix = np.stack([records[i][0] for i in ids]) if ids else None
+                self.matrices[namespace] = (ids, matrix)
+            return self.matrices[namespace]
+
+    def query(self, vector, top_k=10, namespace="ns1", include_metadata=True):
+        self._admit()
+        self.query_latency.sleep()
+        ids, matrix = self._matrix(namespace)
+        if matrix is None:
+            return {'matches': []}
+        q = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ (q / max(float(np.linalg.norm(q)), 1e-12))
+        top = np.argsort(-scores)[:top_k]
+        records = self.namespaces[namespace]
+        return {
+            'matches': [
+                {
+                    'id': ids[i],
+                    'score': float(scores[i]),
+                    'metadata': records[ids[i]][1] if include_metadata else {}
+                }
+                for i in top
+            ]
+        }
+
+    def fetch(self, ids, namespace="ns1"):
+        self._admit()
+        self.query_latency.sleep()
+        with self.lock:
+            records = self.namespaces.get(namespace, {})
+            return {
+                i: {'values': records[i][0].tolist(), 'metadata': records[i][1]}
+                for i in ids if i in records
+            }
+
+    def delete(self, ids, namespace="ns1"):
+        self._admit()
+        with self.lock:
+            records = self.namespaces.get(namespace, {})
+            for i in ids:
+                records.pop(i, None)
+            self.matrices.pop(namespace, None)
+
+
+class FakeGeminiLLM(LLM):
+    """
+    LLM that answers after Gemini-like delays: time to first token, then
+    tokens_per_second. Calls beyond requests_per_second raise RateLimitError.
+    """
+
+    def __init__(self, first_token_latency=0.4, tokens_per_second=80, answer_tokens=120,
+                 requests_per_second=None, seed=0):
+        self.first_token_latency = Latency(first_token_latency, seed=seed)
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+
+    def stream(self, prompt: str):
+        if self.bucket and not self.bucket.try_acquire():
+            raise RateLimitError()
+        self.first_token_latency.sleep()
+        for i in range(self.answer_tokens):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            yield "token "
+
+    def generate(self, prompt: str) -> str:
+        return ''.join(self.stream(prompt))
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+# Add project root to Python path to import core modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.cache import QueryCache
+from core.chatbot import Chatbot
+from core.embedding import EmbeddingManager
+from core.manifest import IngestionManifest
+from core.pipeline import PdfSource
+from core.utils import extract_pages_from_pdf, split_text
+from corpus import generate_corpus
+from fakes import FakeGeminiLLM, FakePineconeVectorStore
+
+current_dir = Path(__file__).parent
+results_dir = current_dir / "results"
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+ERROR_PREFIX = "I encountered an error"
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        'count': len(ms),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max())
+    }
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its finished children (parse workers)."""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=current_dir, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timed_calls(func, inputs, concurrency):
+    """Returns (seconds, result, error) for func called on every input."""
+    def call(value):
+        start = time.perf_counter()
+        try:
+            result, error = func(value), None
+        except Exception as e:
+            result, error = None, e
+        return time.perf_counter() - start, result, error
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(call, inputs))
+
+def make_queries(sentences, count):
+    # Distinct texts, so the query cache never answers for the model
+    return [sentences[i % len(sentences)] + ('' if i < len(sentences) else f" {i}") for i in range(count)]
+
+def run_benchmark(args, work_dir):
+    os.environ.update({
+        'MODEL_NAME': args.model,
+        'EMBEDDING_BACKEND': args.backend,
+        # The caches start empty in work_dir, so ingestion is measured cold either way
+        'TEXT_CACHE': '0' if args.no_caches else '1',
+        'EMBEDDING_CACHE': '0' if args.no_caches else '1',
+        'TEXT_CACHE_PATH': os.path.join(work_dir, 'text_cache'),
+        'EMBEDDING_CACHE_PATH': os.path.join(work_dir, 'embedding_cache'),
+        'INGEST_MANIFEST_PATH': os.path.join(work_dir, 'ingest_manifest.json'),
+        'LEXICAL_INDEX_PATH': os.path.join(work_dir, 'lexical_index')
+    })
+    corpus_dir = os.path.join(work_dir, 'corpus')
+    print(f"Generating {args.documents} PDFs of {args.pages} pages in {corpus_dir}")
+    corpus = generate_corpus(corpus_dir, args.documents, args.pages, seed=args.seed)
+
+    vector_store = FakePineconeVectorStore(args.upsert_latency, args.query_latency,
+                                           args.vector_rps, seed=args.seed)
+    embedding_manager = EmbeddingManager(vector_store=vector_store)
+    chatbot = Chatbot(embedding_manager, cache=QueryCache(),
+                      llm=FakeGeminiLLM(args.llm_first_token, args.llm_tokens_per_second,
+                                        requests_per_second=args.llm_rps, seed=args.seed))
+
+    start = time.perf_counter()
+    embedding_manager.warm_up()
+    load_seconds = time.perf_counter() - start
+
+    print("Ingesting")
+    start = time.perf_counter()
+    chunks_per_file = embedding_manager.process_pdfs_and_upload(
+        [PdfSource(os.path.join(corpus_dir, name)) for name in sorted(os.listdir(corpus_dir))],
+        extract_pages_from_pdf,
+        split_text,
+        manifest=IngestionManifest(os.path.join(work_dir, 'ingest_manifest.json')),
+        parse_workers=args.parse_workers
+    )
+    ingest_seconds = time.perf_counter() - start
+    chunks = sum(chunks_per_file.values())
+    vectors = len(vector_store.namespaces.get('ns1', {}))
+
+    print(f"Running {args.queries} searches ({args.concurrency} concurrent)")
+    search_results = timed_calls(chatbot.search, make_queries(corpus['sample_sentences'], args.queries),
+                                 args.concurrency)
+
+    print(f"Generating {args.answers} answers ({args.concurrency} concurrent)")
+    answer_queries = make_queries(corpus['sample_sentences'][::-1], args.answers)
+    answer_results = timed_calls(chatbot.generate_response, answer_queries, args.concurrency)
+
+    return {
+        'config': vars(args),
+        'environment': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'ingestion': {
+            'files': len(chunks_per_file),
+            'pages': corpus['pages'],
+            'chunks': chunks,
+            'vectors': vectors,
+            'seconds': ingest_seconds,
+            'pages_per_second': corpus['pages'] / ingest_seconds,
+            'chunks_per_second': chunks / ingest_seconds,
+            'vectors_per_second': vectors / ingest_seconds,
+            'rate_limited_requests': vector_store.rate_limited,
+            'model_load_seconds': load_seconds
+        },
+        'search': {
+            **latency_summary([seconds for seconds, _, _ in search_results]),
+            'errors': sum(error is not None for _, _, error in search_results)
+        },
+        'search_batching': chatbot.query_batch_stats(),
+        'answer': {
+            **latency_summary([seconds for seconds, _, _ in answer_results]),
+            # generate_response reports failures in its answer text
+            'errors': sum(str(answer).startswith(ERROR_PREFIX) for _, answer, _ in answer_results)
+        },
+        'context': chatbot.context_stats(),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def compare(report, baseline):
+    """Prints the relative change of every numeric metric against a baseline report."""
+    for section, metrics in report.items():
+        if section in ('config', 'environment') or not isinstance(metrics, dict):
+            continue
+        for name, value in metrics.items():
+            previous = baseline.get(section, {}).get(name)
+            if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+                change = 100 * (value - previous) / previous
+                print(f"{section}.{name}: {previous:.4g} -> {value:.4g} ({change:+.1f}%)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingestion and query latency on a synthetic corpus with fake Pinecone and Gemini."
+    )
+    parser.add_argument('--model', default=os.getenv('BENCHMARK_MODEL_NAME', DEFAULT_MODEL),
+                        help="Embedding model (a small one keeps CPU-only runs short)")
+    parser.add_argument('--backend', default=os.getenv('EMBEDDING_BACKEND', 'torch'))
+    parser.add_argument('--documents', type=int, default=50)
+    parser.add_argument('--pages', type=int, default=5, help="Pages per document")
+    parser.add_argument('--parse-workers', type=int, default=None)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--answers', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--upsert-latency', type=float, default=0.05, help="Seconds per upsert of 100 vectors")
+    parser.add_argument('--query-latency', type=float, default=0.03, help="Seconds per vector store query")
+    parser.add_argument('--vector-rps', type=float, default=None, help="Vector store requests/s before 429s")
+    parser.add_argument('--llm-first-token', type=float, default=0.4, help="Seconds to the first LLM token")
+    parser.add_argument('--llm-tokens-per-second', type=float, default=80)
+    parser.add_argument('--llm-rps', type=float, default=None, help="LLM requests/s before 429s")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-caches', action='store_true',
+                        help="Disable the text and embedding caches (they are on by default, as in the app)")
+    parser.add_argument('--output', default=None, help="Report path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', default=None, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='rag-benchmark-') as work_dir:
+        report = run_benchmark(args, work_dir)
+
+    output = Path(args.output or results_dir / f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({key: report[key] for key in ('ingestion', 'search', 'answer', 'peak_rss_mb')}, indent=2))
+    print(f"Report saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
@@ -0,0 +1,106 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into batched calls.
+
+    submit() queues an item and blocks until its result is ready. A worker
+    thread takes the first waiting item, keeps collecting for up to
+    max_wait_ms or until max_batch_size items are collected, then calls
+    batch_func once with the list of items. batch_func must return one
+    result per item, in order. If it raises, every caller in the batch gets
+    the exception.
+    """
+
+    def __init__(self, batch_func, max_batch_size=32, max_wait_ms=5.0, name='micro-batcher'):
+        self.batch_func = batch_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.counters = {'batches': 0, 'items': 0, 'max_batch_size': 0, 'max_queue_depth': 0,
+                         'wait_seconds': 0.0, 'run_seconds': 0.0}
+        self.closed = False
+        self.worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self.worker.start()
+
+    def submit(self, item):
+        if self.closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self.queue.put((item, future, time.monotonic()))
+        with self.lock:
+            self.counters['max_queue_depth'] = max(self.counters['max_queue_depth'], self.queue.qsize())
+        return future.result()
+
+    def _collect(self):
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                entry = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Finish this batch; the worker stops on the next collect
+                self.queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.monotonic()
+            try:
+                results = self.batch_func([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"batch_func returned {len(results)} results for {len(batch)} items")
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finished = time.monotonic()
+
+            with self.lock:
+                self.counters['batches'] += 1
+                self.counters['items'] += len(batch)
+                self.counters['max_batch_size'] = max(self.counters['max_batch_size'], len(batch))
+                self.counters['wait_seconds'] += sum(started - queued_at for _, _, queued_at in batch)
+                self.counters['run_seconds'] += finished - started
+
+    def stats(self):
+        """Returns batch counts, mean and max batch size, queue depth and mean wait/run times."""
+        with self.lock:
+            counters = dict(self.counters)
+        batches = counters['batches']
+        items = counters['items']
+        return {
+            'batches': batches,
+            'items': items,
+            'mean_batch_size': items / batches if batches else 0.0,
+            'max_batch_size': counters['max_batch_size'],
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': counters['max_queue_depth'],
+            'mean_wait_ms': 1000 * counters['wait_seconds'] / items if items else 0.0,
+            'mean_batch_ms': 1000 * counters['run_seconds'] / batches if batches else 0.0
+        }
+
+    def close(self):
+        """Stops the worker once already queued items have been processed."""
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.worker.join()
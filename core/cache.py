@@ -0,0 +1,99 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional per-entry time to live (seconds)."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self.data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.data[key] = (value, expires_at)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class QueryCache:
+    """
+    Three cache levels used by Chatbot:
+      embeddings - normalized query -> query embedding
+      retrievals - (embedding, k, namespace) -> (scores, chunks)
+      answers    - (normalized question, context hash) -> generated answer
+
+    Embeddings only depend on the model, so they survive index updates;
+    retrievals and answers are dropped by invalidate_index().
+    """
+
+    def __init__(self, embedding_size=4096, embedding_ttl=None,
+                 retrieval_size=1024, retrieval_ttl=3600,
+                 answer_size=512, answer_ttl=3600):
+        self.embeddings = TTLCache(embedding_size, embedding_ttl)
+        self.retrievals = TTLCache(retrieval_size, retrieval_ttl)
+        self.answers = TTLCache(answer_size, answer_ttl)
+        # Bumped on every invalidation so results computed against an older
+        # index are not cached after the fact
+        self.generation = 0
+
+    @staticmethod
+    def normalize_query(query):
+        return ' '.join(query.split())
+
+    @staticmethod
+    def context_hash(context):
+        return hashlib.sha256(context.encode('utf-8')).hexdigest()
+
+    def invalidate_index(self):
+        self.generation += 1
+        self.retrievals.clear()
+        self.answers.clear()
+
+    def stats(self):
+        return {
+            'embeddings': self.embeddings.stats(),
+            'retrievals': self.retrievals.stats(),
+            'answers': self.answers.stats()
+        }
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class RemoteCatalog:
+    """
+    SQLite record of a remote tree as of the last crawl.
+
+    directories holds each listed directory with the modify time it had in
+    its parent's listing and whether it had subdirectories. files holds each
+    remote file's size and modify time, the version that was last downloaded
+    and where to, and when it was last ingested.
+
+    A leaf directory whose modify time is unchanged has the same entries as
+    last time, so a crawl can take its files from the catalog instead of
+    listing it again.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS directories (
+            source TEXT NOT NULL,
+            path TEXT NOT NULL,
+            modify TEXT,
+            is_leaf INTEGER NOT NULL,
+            listed_at REAL NOT NULL,
+            PRIMARY KEY (source, path)
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            source TEXT NOT NULL,
+            path TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            size INTEGER,
+            modify TEXT,
+            downloaded_size INTEGER,
+            downloaded_modify TEXT,
+            local_path TEXT,
+            downloaded_at REAL,
+            ingested_at REAL,
+            PRIMARY KEY (source, path)
+        );
+        CREATE INDEX IF NOT EXISTS files_directory ON files (source, directory);
+        CREATE INDEX IF NOT EXISTS files_local_path ON files (local_path);
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(self.SCHEMA)
+
+    def is_unchanged_leaf(self, source, directory, modify):
+        """True if directory was listed before as a leaf with the same modify time."""
+        if not modify:
+            return False
+        with self.lock:
+            row = self.db.execute(
+                "SELECT modify, is_leaf FROM directories WHERE source = ? AND path = ?", (source, directory)
+            ).fetchone()
+        return row is not None and row[0] == modify and bool(row[1])
+
+    def files_in(self, source, directory):
+        """Returns the (path, facts) pairs last recorded for a directory."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT path, size, modify FROM files WHERE source = ? AND directory = ?", (source, directory)
+            ).fetchall()
+        return [(path, {'type': 'file', 'size': size, 'modify': modify}) for path, size, modify in rows]
+
+    def record_listing(self, source, directory, modify, files, is_leaf):
+        """Stores a fresh listing of directory; files it no longer contains are removed."""
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO directories (source, path, modify, is_leaf, listed_at) VALUES (?, ?, ?, ?, ?)",
+                (source, directory, modify, int(is_leaf), now)
+            )
+            self.db.execute("CREATE TEMP TABLE IF NOT EXISTS listed (path TEXT PRIMARY KEY)")
+            self.db.execute("DELETE FROM listed")
+            self.db.executemany("INSERT OR IGNORE INTO listed (path) VALUES (?)", [(path,) for path, _ in files])
+            self.db.execute(
+                "DELETE FROM files WHERE source = ? AND directory = ? AND path NOT IN (SELECT path FROM listed)",
+                (source, directory)
+            )
+            self.db.executemany(
+                """INSERT INTO files (source, path, directory, size, modify) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (source, path) DO UPDATE SET size = excluded.size, modify = excluded.modify""",
+                [(source, path, directory, facts['size'], facts['modify']) for path, facts in files]
+            )
+
+    def is_downloaded(self, source, path, size, modify):
+        """True if the recorded download is of the same size and modify time as the remote file."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT downloaded_size, downloaded_modify FROM files WHERE source = ? AND path = ?", (source, path)
+            ).fetchone()
+        return row is not None and row[0] == size and row[1] == modify
+
+    def has_download_record(self, source, path):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT downloaded_at FROM files WHERE source = ? AND path = ?", (source, path)
+            ).fetchone()
+        return row is not None and row[0] is not None
+
+    def mark_downloaded(self, source, path, size, modify, local_path):
+        with self.lock, self.db:
+            self.db.execute(
+                """UPDATE files SET downloaded_size = ?, downloaded_modify = ?, local_path = ?, downloaded_at = ?
+                   WHERE source = ? AND path = ?""",
+                (size, modify, os.path.abspath(local_path), time.time(), source, path)
+            )
+
+    def pending_ingest(self, source=None, suffix='.pdf'):
+        """Local paths of downloaded files that were not ingested since they were downloaded."""
+        query = """SELECT local_path FROM files
+                   WHERE downloaded_at IS NOT NULL AND (ingested_at IS NULL OR ingested_at < downloaded_at)
+                   AND local_path LIKE ?"""
+        params = [f"%{suffix}"]
+        if source:
+            query += " AND source = ?"
+            params.append(source)
+        with self.lock:
+            return [row[0] for row in self.db.execute(query + " ORDER BY local_path", params)]
+
+    def mark_ingested(self, local_paths):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany("UPDATE files SET ingested_at = ? WHERE local_path = ?",
+                                [(now, os.path.abspath(path)) for path in local_paths])
+
+    def close(self):
+        with self.lock:
+            self.db.close()
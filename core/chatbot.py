@@ -1,66 +1,233 @@
-import google.generativeai as genai
-from typing import List, Tuple
+import heapq
+import itertools
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import numpy as np
 from dotenv import load_dotenv
 
+from core import metrics
+from core.cache import QueryCache
+from core.context import ContextBuilder
+from core.lexical import reciprocal_rank_scores
+from core.llm import GeminiLLM
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class Chatbot:
-    def __init__(self, embedding_manager):
+    def __init__(self, embedding_manager, cache=None, llm=None, context_builder=None):
         self.embedding_manager = embedding_manager
+        self.cache = cache or QueryCache()
+        self.context_builder = context_builder or ContextBuilder(
+            token_budget=int(os.getenv('CONTEXT_TOKEN_BUDGET', 1200))
+        )
+        self.embedding_manager.index_listeners.append(self.cache.invalidate_index)
+        # Queries the namespaces of a multi-collection search in parallel
+        self.search_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('SEARCH_FANOUT_WORKERS', 8)), thread_name_prefix='search'
+        )
         
-        # Initialize Gemini
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.llm = genai.GenerativeModel("gemini-1.5-flash")
+        # Gemini unless another LLM backend is supplied; created on first use
+        self._llm = llm
+        self._llm_lock = threading.Lock()
 
-    def search(self, query: str, k: int = 10) -> Tuple[List[float], List[str]]:
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = GeminiLLM()
+        return self._llm
+
+    @property
+    def is_ready(self):
+        return self._llm is not None and self.embedding_manager.is_ready
+
+    def warm_up(self):
+        """Loads the embedding model, vector store client and LLM client ahead of the first query."""
+        self.embedding_manager.warm_up()
+        self.llm
+
+    def search(self, query: str, k: int = 10, collections=None) -> Tuple[List[float], List[str]]:
         """
         Searches the vector database for relevant chunks based on the query.
+
+        collections names the collections to search (all configured ones by
+        default). Their namespaces are queried concurrently and the k best
+        matches across them are kept. When the embedding manager has a lexical
+        index, BM25 hits for the query are fused with the dense matches of each
+        namespace, and matches are merged on their fused (RRF) score; otherwise
+        on cosine similarity.
         """
-        embedded_query = self.embedding_manager.embed_text(query)[0].tolist()
-        response = self.embedding_manager.index.query(
-            namespace="ns1",
-            vector=embedded_query,
-            top_k=k,
-            include_values=False,
-            include_metadata=True
-        )
-        
-        scores = []
-        retrieved_chunks = []
-        
-        for match in response.get('matches', []):
-            scores.append(match.get('score'))
-            retrieved_chunks.append(match.get('metadata', {}).get('chunk', ''))
-            
-        return scores, retrieved_chunks
+        with metrics.span('chat.search'):
+            namespaces = self.embedding_manager.collections.namespaces(collections)
+            normalized_query = self.cache.normalize_query(query)
+            embedded_query = self.cache.embeddings.get(normalized_query)
+            if embedded_query is None:
+                embedded_query = self.embedding_manager.embed_query(normalized_query).tolist()
+                self.cache.embeddings.set(normalized_query, embedded_query)
+
+            retrieval_key = (tuple(embedded_query), k, tuple(namespaces))
+            cached = self.cache.retrievals.get(retrieval_key)
+            if cached is not None:
+                return list(cached[0]), list(cached[1])
+
+            generation = self.cache.generation
+            if len(namespaces) == 1:
+                matches = self.search_namespace(normalized_query, embedded_query, k, namespaces[0])
+            else:
+                results = self.search_executor.map(
+                    lambda namespace: self.search_namespace(normalized_query, embedded_query, k, namespace),
+                    namespaces
+                )
+                matches = heapq.nlargest(k, itertools.chain.from_iterable(results), key=self.merge_key)
+
+            scores = []
+            retrieved_chunks = []
+
+            for match in matches:
+                scores.append(match.get('score'))
+                retrieved_chunks.append(match.get('metadata', {}).get('chunk', ''))
+
+            if generation == self.cache.generation:
+                self.cache.retrievals.set(retrieval_key, (tuple(scores), tuple(retrieved_chunks)))
+            return scores, retrieved_chunks
+
+    def search_namespace(self, query, embedded_query, k, namespace):
+        """Returns the top k matches in one namespace."""
+        with metrics.span('vector_store.query'):
+            response = self.embedding_manager.vector_store.query(
+                vector=embedded_query,
+                top_k=k,
+                namespace=namespace
+            )
+
+        matches = response.get('matches', [])
+        if self.embedding_manager.lexical_index:
+            with metrics.span('chat.fuse_lexical'):
+                matches = self.fuse_lexical(query, embedded_query, matches, k, namespace)
+        return matches
+
+    @staticmethod
+    def merge_key(match):
+        """Ranks matches from different namespaces: by fused score after hybrid search, else by cosine."""
+        return match.get('rrf_score', match.get('score') or 0.0)
+
+    def fuse_lexical(self, query, embedded_query, matches, k, namespace):
+        """
+        Merges dense matches with BM25 hits using reciprocal rank fusion.
+
+        Returns the matches in fused order, each with its fused score as
+        rrf_score. Hits found only lexically are fetched from the vector store
+        and scored by cosine similarity to the query, so filter_chunks can apply
+        the same threshold to every match.
+        """
+        lexical_hits = self.embedding_manager.lexical_index.search(query, k, namespace)
+        by_id = {match.get('id'): match for match in matches}
+        fused_scores = reciprocal_rank_scores([list(by_id), [doc_id for doc_id, _ in lexical_hits]])
+        fused_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]
+        missing = [doc_id for doc_id in fused_ids if doc_id not in by_id]
+        if missing:
+            q = np.asarray(embedded_query, dtype=np.float32)
+            q /= max(float(np.linalg.norm(q)), 1e-12)
+            for doc_id, vector in self.embedding_manager.vector_store.fetch(missing, namespace).items():
+                values = np.asarray(vector['values'], dtype=np.float32)
+                score = float(values @ q) / max(float(np.linalg.norm(values)), 1e-12)
+                by_id[doc_id] = {'id': doc_id, 'score': score, 'metadata': vector['metadata']}
+        return [{**by_id[doc_id], 'rrf_score': fused_scores[doc_id]} for doc_id in fused_ids if doc_id in by_id]
+
+    def cache_stats(self):
+        """Returns hit/miss counters for each query cache level."""
+        return self.cache.stats()
+
+    def query_batch_stats(self):
+        """Returns batch size and queue depth stats for query embedding."""
+        return self.embedding_manager.query_batcher.stats()
+
+    def context_stats(self):
+        """Returns prompt tokens used and saved by context assembly so far."""
+        return self.context_builder.stats()
 
     def filter_chunks(self, scores: List[float], chunks: List[str], 
                      threshold: float = 0.7) -> List[str]:
         """Filter chunks based on similarity score"""
         return [chunk for score, chunk in zip(scores, chunks) if score > threshold]
 
-    def generate_response(self, message: str) -> str:
-        try:
-            scores, chunks = self.search(message, k=10)
+    def prepare_response(self, message: str, collections=None):
+        """
+        Retrieves context for a message.
+
+        Returns (answer, prompt, answer_key). answer is set when no LLM call is
+        needed (nothing relevant was found, or the answer is cached); otherwise
+        prompt is ready to send and the answer should be cached under answer_key.
+        """
+        scores, chunks = self.search(message, k=10, collections=collections)
+        with metrics.span('chat.filter_chunks'):
             relevant_chunks = self.filter_chunks(scores, chunks)
-            
-            if not relevant_chunks:
-                return "I couldn't find any relevant information in the knowledge base."
-            
-            context = "\n".join(relevant_chunks)
-            prompt = f"""Based on the following context, please answer the question. 
-            If the context doesn't contain relevant information, say so.
-            
-            Context:
-            {context}
-            
-            Question: {message}
-            
-            Answer:"""
-            
-            response = self.llm.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            return f"I encountered an error while generating the response: {str(e)}"
\ No newline at end of file
+        
+        if not relevant_chunks:
+            return "I couldn't find any relevant information in the knowledge base.", None, None
+        
+        with metrics.span('chat.build_context'):
+            context_chunks, stats = self.context_builder.build(relevant_chunks)
+        logger.debug(f"Context: {stats['context_tokens']} tokens, {stats['tokens_saved']} saved "
+                     f"({stats['duplicates_dropped']} duplicates, {stats['over_budget_dropped']} over budget)")
+        context = "\n".join(context_chunks)
+        answer_key = (self.cache.normalize_query(message), self.cache.context_hash(context))
+        cached_answer = self.cache.answers.get(answer_key)
+        if cached_answer is not None:
+            return cached_answer, None, None
+
+        prompt = f"""Based on the following context, please answer the question. 
+        If the context doesn't contain relevant information, say so.
+        
+        Context:
+        {context}
+        
+        Question: {message}
+        
+        Answer:"""
+        return None, prompt, answer_key
+
+    def generate_response(self, message: str, collections=None) -> str:
+        with metrics.profile('chat_turn', message_chars=len(message), collections=collections):
+            try:
+                answer, prompt, answer_key = self.prepare_response(message, collections)
+                if answer is not None:
+                    return answer
+
+                with metrics.span('llm.generate'):
+                    answer = self.llm.generate(prompt)
+                self.cache.answers.set(answer_key, answer)
+                return answer
+
+            except Exception as e:
+                return f"I encountered an error while generating the response: {str(e)}"
+
+    def generate_response_stream(self, message: str, collections=None):
+        """Same as generate_response, but yields the answer in pieces as the LLM produces them."""
+        parts = []
+        with metrics.profile('chat_turn', message_chars=len(message), collections=collections, stream=True):
+            try:
+                answer, prompt, answer_key = self.prepare_response(message, collections)
+                if answer is not None:
+                    yield answer
+                    return
+
+                start = time.perf_counter()
+                with metrics.span('llm.stream'):
+                    for piece in self.llm.stream(prompt):
+                        if not parts:
+                            metrics.observe('llm.first_token', time.perf_counter() - start)
+                        parts.append(piece)
+                        yield piece
+                self.cache.answers.set(answer_key, ''.join(parts))
+
+            except Exception as e:
+                separator = "\n\n" if parts else ""
+                yield f"{separator}I encountered an error while generating the response: {str(e)}"
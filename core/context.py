@@ -0,0 +1,84 @@
+import re
+import threading
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def shingles(text, size=3):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def similarity(a, b):
+    """Overlap of two shingle sets: the larger of Jaccard and containment of the smaller set."""
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return max(intersection / len(a | b), intersection / min(len(a), len(b)))
+
+
+class ContextBuilder:
+    """
+    Selects the retrieved chunks that go into the prompt.
+
+    Chunks are taken in rank order. A chunk whose word 3-gram overlap with an
+    already selected chunk reaches duplicate_threshold is dropped (overlapping
+    splits, mirrored copies of the same paper), and chunks that no longer fit
+    in token_budget are skipped. Totals of tokens saved are kept across calls.
+    """
+
+    def __init__(self, token_budget=1200, duplicate_threshold=0.8, count_tokens=estimate_tokens):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.count_tokens = count_tokens
+        self.lock = threading.Lock()
+        self.totals = {'calls': 0, 'input_tokens': 0, 'context_tokens': 0, 'tokens_saved': 0,
+                       'duplicates_dropped': 0, 'over_budget_dropped': 0}
+
+    def build(self, chunks):
+        """Returns (selected chunks, stats) for chunks ordered best first."""
+        selected = []
+        selected_shingles = []
+        used_tokens = 0
+        input_tokens = 0
+        duplicates = 0
+        over_budget = 0
+
+        for chunk in chunks:
+            tokens = self.count_tokens(chunk)
+            input_tokens += tokens
+            chunk_shingles = shingles(chunk)
+            if any(similarity(chunk_shingles, other) >= self.duplicate_threshold for other in selected_shingles):
+                duplicates += 1
+                continue
+            # The best chunk is always kept, even if it alone exceeds the budget
+            if selected and used_tokens + tokens > self.token_budget:
+                over_budget += 1
+                continue
+            selected.append(chunk)
+            selected_shingles.append(chunk_shingles)
+            used_tokens += tokens
+
+        stats = {
+            'input_tokens': input_tokens,
+            'context_tokens': used_tokens,
+            'tokens_saved': input_tokens - used_tokens,
+            'duplicates_dropped': duplicates,
+            'over_budget_dropped': over_budget
+        }
+        with self.lock:
+            self.totals['calls'] += 1
+            for key, value in stats.items():
+                self.totals[key] += value
+        return selected, stats
+
+    def stats(self):
+        with self.lock:
+            return dict(self.totals)
@@ -1,59 +1,182 @@
 import os
-import torch
-from transformers import AutoModel, AutoTokenizer
-from pinecone import Pinecone
+import threading
+import numpy as np
 from dotenv import load_dotenv
 
+from core import metrics
+from core.batching import MicroBatcher
+from core.embedding_cache import EmbeddingCache, chunk_digest
+from core.lexical import LexicalIndex
+from core.manifest import IngestionManifest
+from core.namespaces import Collections
+from core.pipeline import IngestionPipeline
+from core.text_cache import TextCache
+from core.vector_store import create_vector_store
+
 load_dotenv()
 
 class EmbeddingManager:
-    def __init__(self):
+    """
+    Embeds text and writes to the vector store.
+
+    The model and the vector store client are created on first use (or by
+    warm_up()), so constructing a manager is cheap and importing this module
+    does not import torch or transformers. When EMBEDDING_SERVICE_URL is set,
+    texts are embedded by a shared embedding service instead of a local model.
+    """
+
+    def __init__(self, vector_store=None, backend=None):
         self.model_name = os.getenv('MODEL_NAME')
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModel.from_pretrained(self.model_name)
-        self.pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
-        self.index = self.pc.Index(os.getenv('PINECONE_INDEX_NAME'))
+        self.backend = backend or os.getenv('EMBEDDING_BACKEND', 'torch')
         self.batch_size = 32
+        self.max_length = 512
+        self.service_url = os.getenv('EMBEDDING_SERVICE_URL')
+        self._encoder = None
+        self._vector_store = vector_store
+        self._query_batcher = None
+        self._embedding_cache = None
+        self._init_lock = threading.Lock()
+        self.manifest = IngestionManifest()
+        self.collections = Collections()
+        # Extracted pages and chunks, reused when PDFs are re-ingested
+        self.text_cache = TextCache() if os.getenv('TEXT_CACHE', '1') == '1' else None
+        # BM25 index over the same chunks, used for hybrid retrieval
+        self.lexical_index = LexicalIndex() if os.getenv('HYBRID_SEARCH', '1') == '1' else None
+        # Called with no arguments after vectors are upserted or deleted
+        self.index_listeners = []
+
+    @property
+    def encoder(self):
+        """The tokenizer and model (or embedding service client), loaded on first access."""
+        if self._encoder is None:
+            with self._init_lock:
+                if self._encoder is None:
+                    if self.service_url:
+                        from core.embedding_service import EmbeddingClient
+                        self._encoder = EmbeddingClient(self.service_url)
+                    else:
+                        from core.inference import TextEncoder
+                        self._encoder = TextEncoder(self.model_name, self.backend, self.max_length)
+        return self._encoder
+
+    @property
+    def vector_store(self):
+        """The vector store client, created on first access."""
+        if self._vector_store is None:
+            with self._init_lock:
+                if self._vector_store is None:
+                    self._vector_store = create_vector_store()
+        return self._vector_store
+
+    @property
+    def query_batcher(self):
+        """Coalesces concurrent embed_query calls into one forward pass."""
+        if self._query_batcher is None:
+            with self._init_lock:
+                if self._query_batcher is None:
+                    self._query_batcher = MicroBatcher(
+                        self.embed_texts,
+                        max_batch_size=int(os.getenv('QUERY_BATCH_MAX_SIZE', 32)),
+                        max_wait_ms=float(os.getenv('QUERY_BATCH_MAX_WAIT_MS', 5)),
+                        name='query-batcher'
+                    )
+        return self._query_batcher
+
+    @property
+    def embedding_cache(self):
+        """Stored chunk embeddings for this model and backend, or None when EMBEDDING_CACHE=0."""
+        if self._embedding_cache is None and os.getenv('EMBEDDING_CACHE', '1') == '1':
+            # Resolved before taking _init_lock, which loading the encoder also takes
+            encoder = self.encoder
+            with self._init_lock:
+                if self._embedding_cache is None:
+                    self._embedding_cache = EmbeddingCache(f"{encoder.model_name}-{encoder.backend}")
+        return self._embedding_cache
+
+    @property
+    def is_ready(self):
+        return self._encoder is not None and self._vector_store is not None
+
+    def warm_up(self):
+        """Loads the model and vector store client and runs one forward pass."""
+        self.vector_store
+        self.embed_text("warm up")
 
     def embed_text(self, text: str):
-        inputs = self.tokenizer(text, return_tensors='pt', truncation=True, padding=True, max_length=512)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1)
-
-    def upload_to_pinecone(self, vectors, namespace="ns1"):
-        self.index.upsert(vectors=vectors, namespace=namespace)
-
-    def process_pdfs_and_upload(self, pdf_files, extract_text_func, split_text_func, namespace="ns1"):
-        chunks_per_file = {}
-        
-        for pdf_file in pdf_files:
-            text = extract_text_func(pdf_file)
-            document_chunks = split_text_func(text)
-            vectors_to_upsert = []
-            
-            # Get filename without extension for the ID
-            filename = os.path.splitext(pdf_file.name)[0]
-            # Replace spaces and special characters for safe IDs
-            safe_filename = filename.replace(' ', '-').replace('/', '_').replace('\\', '_')
-            
-            for batch_index in range(0, len(document_chunks), self.batch_size):
-                batch = document_chunks[batch_index:batch_index + self.batch_size]
-                for chunk_index, chunk in enumerate(batch):
-                    embedding = self.embed_text(chunk).squeeze().tolist()
-                    vector = {
-                        "id": f"{safe_filename}-chunk-{batch_index + chunk_index}",
-                        "values": embedding,
-                        "metadata": {
-                            "chunk": chunk,
-                            "file_name": pdf_file.name,
-                            "chunk_index": batch_index + chunk_index
-                        }
-                    }
-                    vectors_to_upsert.append(vector)
-                self.upload_to_pinecone(vectors_to_upsert, namespace)
-                vectors_to_upsert.clear()
-            
-            chunks_per_file[pdf_file.name] = len(document_chunks)
-        
-        return chunks_per_file
\ No newline at end of file
+        """Embeds a single text, returning an array of shape (1, dim)."""
+        return self.embed_texts([text])
+
+    def embed_query(self, text: str):
+        """Embeds one query, batched with queries from other threads; returns an array of shape (dim,)."""
+        with metrics.span('embedding.embed_query'):
+            return self.query_batcher.submit(text)
+
+    def embed_texts(self, texts):
+        """Embeds a list of texts in length-bucketed batches; see TextEncoder.embed_texts."""
+        with metrics.span('embedding.embed_texts'):
+            return self.encoder.embed_texts(texts, self.batch_size)
+
+    def embed_chunks(self, chunks):
+        """
+        Embeds document chunks, reusing stored embeddings of identical chunks.
+
+        Only chunks missing from the embedding cache go through the model, and
+        their vectors are added to the cache.
+        """
+        cache = self.embedding_cache
+        if cache is None:
+            return self.embed_texts(chunks)
+        if not chunks:
+            return np.zeros((0, self.encoder.dim), dtype=np.float32)
+
+        with metrics.span('embedding.cache_lookup'):
+            results = cache.lookup(chunks)
+        missing = {}
+        for i, vector in enumerate(results):
+            if vector is None:
+                missing.setdefault(chunk_digest(chunks[i]), []).append(i)
+        if missing:
+            texts = [chunks[positions[0]] for positions in missing.values()]
+            embeddings = self.embed_texts(texts)
+            cache.add(texts, embeddings)
+            for positions, vector in zip(missing.values(), embeddings):
+                for i in positions:
+                    results[i] = vector
+        return np.stack(results).astype(np.float32)
+
+    def upload_vectors(self, vectors, namespace="ns1"):
+        with metrics.span('vector_store.upsert'):
+            self.vector_store.upsert(vectors, namespace=namespace)
+        self.notify_index_changed()
+
+    def delete_vectors(self, ids, namespace="ns1"):
+        with metrics.span('vector_store.delete'):
+            self.vector_store.delete(ids, namespace=namespace)
+        if self.lexical_index:
+            self.lexical_index.delete(ids, namespace=namespace)
+        self.notify_index_changed()
+
+    def notify_index_changed(self):
+        for listener in self.index_listeners:
+            listener()
+
+    def process_pdfs_and_upload(self, pdf_files, extract_text_func, split_text_func, namespace="ns1",
+                                collection=None, **pipeline_options):
+        """
+        Extracts, splits, embeds and upserts PDFs through an IngestionPipeline.
+
+        The vectors go to the namespace of collection when one is given (see
+        core.namespaces), otherwise to namespace.
+
+        Returns a dict mapping file name to chunk count. Files that failed are
+        logged and left out of the result. Unless a different manifest is passed
+        in pipeline_options, files unchanged since their last ingestion are
+        skipped using self.manifest; likewise self.text_cache is used unless
+        text_cache is passed.
+        """
+        pipeline_options.setdefault('manifest', self.manifest)
+        pipeline_options.setdefault('text_cache', self.text_cache)
+        if collection:
+            namespace = self.collections.namespace(collection)
+        pipeline = IngestionPipeline(self, extract_text_func, split_text_func, namespace, **pipeline_options)
+        return pipeline.run(pdf_files)
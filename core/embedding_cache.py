@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+from core.locks import file_lock
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(PROJECT_ROOT, 'embedding_cache')
+
+DIGEST_SIZE = 16
+
+
+def chunk_digest(text):
+    """Hash of a chunk with whitespace runs collapsed, so reflowed copies share an entry."""
+    normalized = ' '.join(text.split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of chunk embeddings for one model and backend.
+
+    Files in path/<model key>/:
+
+      vectors.bin - float32 rows, read through a memory map
+      index.bin   - one 16-byte chunk digest per row, in row order
+      info.json   - the vector dimension
+
+    The digest -> row map is rebuilt from index.bin on load and refreshed when
+    another process has appended rows. Appends are serialized with a file
+    lock where the platform has one; a row only counts once its digest is
+    written, so an interrupted append is overwritten by the next one.
+    """
+
+    def __init__(self, model_key, path=None):
+        safe_key = model_key.replace('/', '__')
+        self.path = os.path.join(path or os.getenv('EMBEDDING_CACHE_PATH', DEFAULT_EMBEDDING_CACHE_PATH), safe_key)
+        self.vectors_path = os.path.join(self.path, 'vectors.bin')
+        self.index_path = os.path.join(self.path, 'index.bin')
+        self.info_path = os.path.join(self.path, 'info.json')
+        self.lock_path = os.path.join(self.path, 'lock')
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.count = 0
+        self.dim = None
+        self.vectors = None
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.path, exist_ok=True)
+        with self.lock:
+            self._refresh()
+
+    def _refresh(self):
+        """Loads digests (and the dimension) written since the last refresh."""
+        if self.dim is None and os.path.exists(self.info_path):
+            with open(self.info_path) as f:
+                self.dim = json.load(f)['dim']
+        if not os.path.exists(self.index_path):
+            return
+        size = os.path.getsize(self.index_path) // DIGEST_SIZE * DIGEST_SIZE
+        if size <= self.count * DIGEST_SIZE:
+            return
+        with open(self.index_path, 'rb') as f:
+            f.seek(self.count * DIGEST_SIZE)
+            data = f.read(size - self.count * DIGEST_SIZE)
+        for offset in range(0, len(data), DIGEST_SIZE):
+            self.rows.setdefault(data[offset:offset + DIGEST_SIZE], self.count)
+            self.count += 1
+
+    def _vector(self, row):
+        if self.vectors is None or row >= self.vectors.shape[0]:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dim))
+        return np.array(self.vectors[row])
+
+    def lookup(self, texts):
+        """Returns a list with the cached vector for each text, or None where there is none."""
+        digests = [chunk_digest(text) for text in texts]
+        with self.lock:
+            if any(digest not in self.rows for digest in digests):
+                self._refresh()
+            results = [self._vector(self.rows[d]) if d in self.rows else None for d in digests]
+            found = sum(result is not None for result in results)
+            self.hits += found
+            self.misses += len(results) - found
+        return results
+
+    def add(self, texts, embeddings):
+        """Stores embeddings (shape (len(texts), dim)) for texts not already cached."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self.lock, file_lock(self.lock_path):
+            self._refresh()
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                with open(self.info_path, 'w') as f:
+                    json.dump({'dim': self.dim}, f)
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match cache dimension {self.dim}")
+
+            new_digests = []
+            new_rows = []
+            for text, vector in zip(texts, embeddings):
+                digest = chunk_digest(text)
+                if digest in self.rows or digest in new_digests:
+                    continue
+                new_digests.append(digest)
+                new_rows.append(vector)
+            if not new_digests:
+                return
+
+            # Vectors first, then the digests that make them visible
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(self.count * self.dim * 4)
+                f.write(np.stack(new_rows).astype(np.float32).tobytes())
+            with open(self.index_path, 'ab') as f:
+                f.truncate(self.count * DIGEST_SIZE)
+                f.write(b''.join(new_digests))
+            for digest in new_digests:
+                self.rows[digest] = self.count
+                self.count += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': self.count,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
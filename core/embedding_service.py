@@ -0,0 +1,190 @@
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import numpy as np
+from dotenv import load_dotenv
+
+from core.batching import MicroBatcher
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVICE_URL = 'http://127.0.0.1:8765'
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # HTTPServer.server_bind looks up a host name, which a socket path does not have
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        self.socket.bind(self.server_address)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ('local', 0)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class EmbeddingService:
+    """
+    Serves one TextEncoder to every app worker on the machine.
+
+    POST /embed takes {"texts": [...]} and answers with the embeddings as raw
+    little-endian float32 bytes, shape given by the X-Embedding-Dim header.
+    GET /health returns the model, backend and dimension, GET /stats the
+    batching stats. Forward passes run one at a time so that the encoder's
+    intra-op threads have the CPU to themselves; requests that arrive while
+    one is running are merged (up to max_batch_requests) into the next.
+    """
+
+    def __init__(self, encoder, batch_size=32, max_wait_ms=2.0, max_batch_requests=64):
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.batcher = MicroBatcher(self._embed_requests, max_batch_size=max_batch_requests,
+                                    max_wait_ms=max_wait_ms, name='embedding-service')
+
+    def _embed_requests(self, requests):
+        texts = [text for request in requests for text in request]
+        embeddings = self.encoder.embed_texts(texts, self.batch_size)
+        offsets = np.cumsum([0] + [len(request) for request in requests])
+        return [embeddings[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def embed_texts(self, texts):
+        return self.batcher.submit(texts)
+
+    def info(self):
+        return {'model': self.encoder.model_name, 'backend': self.encoder.backend, 'dim': self.encoder.dim}
+
+    def make_server(self, url):
+        """Creates an HTTP server for url (http://host:port or unix:///path/to.sock)."""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if self.path == '/health':
+                    return self._send_json(200, service.info())
+                if self.path == '/stats':
+                    return self._send_json(200, service.batcher.stats())
+                self._send_json(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if self.path != '/embed':
+                    return self._send_json(404, {'error': 'not found'})
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    texts = json.loads(self.rfile.read(length))['texts']
+                    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                        raise ValueError("texts must be a list of strings")
+                except (ValueError, KeyError, TypeError) as e:
+                    return self._send_json(400, {'error': str(e)})
+
+                try:
+                    embeddings = service.embed_texts(texts)
+                except Exception as e:
+                    logger.error(f"Embedding failed: {e}")
+                    return self._send_json(500, {'error': str(e)})
+
+                body = np.ascontiguousarray(embeddings, dtype='<f4').tobytes()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('X-Embedding-Dim', str(embeddings.shape[1]))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        parsed = urlparse(url)
+        if parsed.scheme == 'unix':
+            return UnixHTTPServer(parsed.path, Handler)
+        return ThreadingHTTPServer((parsed.hostname or '127.0.0.1', parsed.port or 80), Handler)
+
+
+class EmbeddingClient:
+    """
+    Client for an EmbeddingService with the same embed_texts() as TextEncoder.
+
+    Each thread keeps its own persistent connection to the service.
+    """
+
+    def __init__(self, url=None, timeout=60):
+        self.url = url or os.getenv('EMBEDDING_SERVICE_URL', DEFAULT_SERVICE_URL)
+        self.timeout = timeout
+        self.local = threading.local()
+        info = self._request('GET', '/health')
+        self.model_name = info['model']
+        self.backend = info['backend']
+        self.dim = info['dim']
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            parsed = urlparse(self.url)
+            if parsed.scheme == 'unix':
+                connection = UnixHTTPConnection(parsed.path, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=self.timeout)
+            self.local.connection = connection
+        return connection
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        # One retry on a fresh connection in case the kept-alive one was closed
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+
+        if response.status != 200:
+            raise RuntimeError(f"Embedding service returned {response.status}: {data.decode('utf-8', 'replace')}")
+        if response.getheader('Content-Type') == 'application/json':
+            return json.loads(data)
+        dim = int(response.getheader('X-Embedding-Dim'))
+        return np.frombuffer(data, dtype='<f4').reshape(-1, dim).astype(np.float32)
+
+    def embed_texts(self, texts, batch_size=32):
+        """Returns a float32 array of shape (len(texts), dim); batching happens in the service."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self._request('POST', '/embed', {'texts': list(texts)})
@@ -0,0 +1,156 @@
+import logging
+import os
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModel, AutoTokenizer
+from dotenv import load_dotenv
+
+from core import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ONNX_CACHE = os.path.join(PROJECT_ROOT, 'onnx_models')
+
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+
+
+def mean_pool(last_hidden_state, attention_mask):
+    """Averages token embeddings over non-padding positions only."""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+    return summed / counts
+
+
+class _LastHiddenState(torch.nn.Module):
+    """Wraps a transformer so ONNX export has a single tensor output."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        kwargs = {'token_type_ids': token_type_ids} if token_type_ids is not None else {}
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, **kwargs).last_hidden_state
+
+
+class TextEncoder:
+    """
+    Tokenizer plus a transformer forward pass on one of several CPU backends:
+
+      torch     - fp32 eager PyTorch
+      int8      - PyTorch with dynamic int8 quantization of Linear layers
+      onnx      - the model exported to ONNX and run with ONNX Runtime
+      onnx-int8 - the exported ONNX graph with dynamic int8 quantization
+
+    ONNX graphs are exported once per model into onnx_cache and reused.
+    num_threads, when given, sets the intra-op thread count of the backend.
+    Vectors from every backend are meant to be interchangeable with the fp32
+    ones; scripts/validate_backend.py measures how closely they agree.
+    """
+
+    def __init__(self, model_name, backend='torch', max_length=512, onnx_cache=None, num_threads=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend}. Choose from: {', '.join(BACKENDS)}")
+        self.model_name = model_name
+        self.backend = backend
+        self.max_length = max_length
+        self.num_threads = num_threads
+        self.onnx_cache = onnx_cache or os.getenv('ONNX_CACHE_DIR', DEFAULT_ONNX_CACHE)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.dim = AutoConfig.from_pretrained(model_name).hidden_size
+        self.model = None
+        self.session = None
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        if backend in ('torch', 'int8'):
+            self.model = AutoModel.from_pretrained(model_name).eval()
+            if backend == 'int8':
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            self.session = self._load_onnx_session()
+
+    def _onnx_path(self, quantized):
+        safe_name = self.model_name.replace('/', '__')
+        return os.path.join(self.onnx_cache, safe_name, 'model.int8.onnx' if quantized else 'model.onnx')
+
+    def _load_onnx_session(self):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("The onnx embedding backends require onnxruntime: pip install onnxruntime onnx")
+
+        path = self._onnx_path(quantized=False)
+        if not os.path.exists(path):
+            self._export_onnx(path)
+        if self.backend == 'onnx-int8':
+            quantized_path = self._onnx_path(quantized=True)
+            if not os.path.exists(quantized_path):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                logger.info(f"Quantizing {path} to int8")
+                quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+            path = quantized_path
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        return onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def _export_onnx(self, path):
+        logger.info(f"Exporting {self.model_name} to ONNX at {path}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        sample = self.tokenizer(["export sample"], return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+        torch.onnx.export(
+            _LastHiddenState(model),
+            tuple(sample[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    def forward(self, inputs):
+        """Returns the last hidden state for a padded batch of tokenizer outputs."""
+        if self.session is not None:
+            feed = {i.name: inputs[i.name].numpy() for i in self.session.get_inputs()}
+            return torch.from_numpy(self.session.run(['last_hidden_state'], feed)[0])
+        with torch.no_grad():
+            return self.model(**inputs).last_hidden_state
+
+    def embed_texts(self, texts, batch_size=32):
+        """
+        Embeds a list of texts with one forward pass per batch.
+
+        Inputs are tokenized once, sorted by token length and batched so that
+        each batch pads to a similar length. Pooling ignores padding, so a text
+        gets the same vector whether it is embedded alone or in a batch.
+        Returns a float32 array of shape (len(texts), dim) in input order.
+        """
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return embeddings
+
+        with metrics.span('embedding.tokenize'):
+            encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        order = sorted(range(len(texts)), key=lambda i: len(encoded['input_ids'][i]))
+
+        for start in range(0, len(order), batch_size):
+            batch_ids = order[start:start + batch_size]
+            features = [{key: encoded[key][i] for key in encoded.keys()} for i in batch_ids]
+            inputs = self.tokenizer.pad(features, return_tensors='pt')
+            with metrics.span('embedding.forward'):
+                pooled = mean_pool(self.forward(inputs), inputs['attention_mask'])
+            embeddings[batch_ids] = pooled.float().numpy()
+
+        return embeddings
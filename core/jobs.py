@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from core.locks import file_lock
+from core.pipeline import PdfSource
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_JOBS_DIR = os.path.join(PROJECT_ROOT, 'ingest_jobs')
+
+FINISHED_STATES = ('completed', 'failed')
+JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+
+def unique_name(name, taken):
+    """Returns name, or "stem (n).ext" for the lowest n that is not in taken."""
+    stem, ext = os.path.splitext(name)
+    candidate = name
+    n = 2
+    while candidate in taken:
+        candidate = f"{stem} ({n}){ext}"
+        n += 1
+    return candidate
+
+
+class JobManager:
+    """
+    Runs ingestion jobs in the background and persists their progress.
+
+    Each job gets a directory under state_dir holding its uploaded files and a
+    status.json that is rewritten as files finish (and at most every
+    save_interval seconds for chunk progress). status() and jobs_for() read
+    these files, so any process sharing state_dir can report on any job.
+
+    A job only runs while its process holds an exclusive lock on the job's
+    lock file, so when several workers recover() the same interrupted jobs
+    each is ingested once. The lock goes away with a process that dies, and
+    the ingestion manifest makes files that had already finished cheap to skip.
+    """
+
+    def __init__(self, embedding_manager, extract_text_func, split_text_func,
+                 state_dir=None, workers=None, save_interval=1.0):
+        self.embedding_manager = embedding_manager
+        self.extract_text_func = extract_text_func
+        self.split_text_func = split_text_func
+        self.state_dir = state_dir or os.getenv('INGEST_JOBS_DIR', DEFAULT_JOBS_DIR)
+        self.save_interval = save_interval
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv('INGEST_JOB_WORKERS', 1)), thread_name_prefix='ingest-job'
+        )
+        # Jobs this process has picked up, so its own threads never run one twice
+        self.claimed = set()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(self.state_dir, 'owners'), exist_ok=True)
+
+    def submit(self, files, namespace="ns1", owner=None):
+        """
+        Moves (file name, path) pairs of uploaded files into a new job, queues
+        it and returns its ID.
+
+        owner (e.g. a browser session ID) is indexed under state_dir/owners so
+        jobs_for() can list the jobs someone started.
+        """
+        job_id = uuid.uuid4().hex
+        files_dir = os.path.join(self.state_dir, job_id, 'files')
+        os.makedirs(files_dir)
+        names = []
+        for name, path in files:
+            name = unique_name(os.path.basename(name), names)
+            shutil.move(path, os.path.join(files_dir, name))
+            names.append(name)
+
+        status = {
+            'id': job_id,
+            'state': 'queued',
+            'namespace': namespace,
+            'owner': owner,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'files': {name: {'status': 'queued', 'chunks': 0, 'error': None} for name in names},
+            'total_files': len(names),
+            'completed_files': 0,
+            'chunks_processed': 0,
+            'chunks_per_second': 0.0,
+            'error': None
+        }
+        self._save(job_id, status)
+        if owner:
+            # A single short append, so concurrent submits do not interleave
+            with open(self._owner_path(owner), 'a', encoding='utf-8') as f:
+                f.write(f"{job_id}\n")
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def status(self, job_id):
+        """Returns a job's last saved status, or None for an unknown job."""
+        # Job IDs come from clients; only accept the ones submit() makes
+        if not isinstance(job_id, str) or not JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(os.path.join(self.state_dir, job_id, 'status.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def jobs_for(self, owner):
+        """Returns the IDs of the jobs submitted by owner, oldest first."""
+        if not owner:
+            return []
+        try:
+            with open(self._owner_path(owner), encoding='utf-8') as f:
+                return f.read().split()
+        except FileNotFoundError:
+            return []
+
+    def recover(self):
+        """Queues the unfinished jobs in state_dir, e.g. the ones a restart interrupted."""
+        for job_id in os.listdir(self.state_dir):
+            status = self.status(job_id)
+            if status and status['state'] not in FINISHED_STATES:
+                self.executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        with self.lock:
+            if job_id in self.claimed:
+                return
+            self.claimed.add(job_id)
+        try:
+            with file_lock(os.path.join(self.state_dir, job_id, 'lock'), blocking=False):
+                self._ingest(job_id)
+        except BlockingIOError:
+            logger.info(f"Ingestion job {job_id} is being run by another process")
+        finally:
+            with self.lock:
+                self.claimed.discard(job_id)
+
+    def _ingest(self, job_id):
+        # Re-read under the lock: another process may have finished the job meanwhile
+        status = self.status(job_id)
+        if status is None or status['state'] in FINISHED_STATES:
+            return
+        if status['state'] == 'running':
+            logger.info(f"Resuming interrupted ingestion job {job_id}")
+            status.update({'completed_files': 0, 'chunks_processed': 0})
+            for entry in status['files'].values():
+                entry.update({'status': 'queued', 'chunks': 0, 'error': None})
+
+        files_dir = os.path.join(self.state_dir, job_id, 'files')
+        status['state'] = 'running'
+        status['started_at'] = time.time()
+        names = list(status['files'])
+        namespace = status['namespace']
+        self._save(job_id, status)
+        last_save = [time.monotonic()]
+
+        def on_vectors_upserted(file_name, count):
+            with self.lock:
+                status['files'][file_name]['status'] = 'processing'
+                status['files'][file_name]['chunks'] += count
+                status['chunks_processed'] += count
+                self._update_throughput(status)
+            if time.monotonic() - last_save[0] >= self.save_interval:
+                last_save[0] = time.monotonic()
+                self._save(job_id, status)
+
+        def on_file_done(file_name, file_status, chunks, error):
+            with self.lock:
+                entry = status['files'][file_name]
+                if file_status != 'failed':
+                    status['chunks_processed'] += chunks - entry['chunks']
+                entry.update({'status': file_status, 'chunks': chunks, 'error': error})
+                status['completed_files'] += 1
+                self._update_throughput(status)
+            self._save(job_id, status)
+
+        try:
+            self.embedding_manager.process_pdfs_and_upload(
+                [PdfSource(os.path.join(files_dir, name)) for name in names],
+                self.extract_text_func,
+                self.split_text_func,
+                namespace,
+                on_file_done=on_file_done,
+                on_vectors_upserted=on_vectors_upserted
+            )
+            state, error = 'completed', None
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            state, error = 'failed', str(e)
+
+        with self.lock:
+            status['state'] = state
+            status['error'] = error
+            status['finished_at'] = time.time()
+            self._update_throughput(status)
+        self._save(job_id, status)
+        # The content now lives in the index; only the status is kept
+        shutil.rmtree(files_dir, ignore_errors=True)
+
+    @staticmethod
+    def _update_throughput(status):
+        if status['started_at']:
+            elapsed = (status['finished_at'] or time.time()) - status['started_at']
+            status['chunks_per_second'] = status['chunks_processed'] / elapsed if elapsed > 0 else 0.0
+
+    def _owner_path(self, owner):
+        # Owners come from clients, so files are named after a digest of the owner
+        return os.path.join(self.state_dir, 'owners', hashlib.sha256(str(owner).encode('utf-8')).hexdigest())
+
+    def _save(self, job_id, status):
+        with self.lock:
+            data = json.dumps(status)
+        path = os.path.join(self.state_dir, job_id, 'status.json')
+        tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,398 @@
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from array import array
+from contextlib import contextmanager
+import numpy as np
+from dotenv import load_dotenv
+
+from core.locks import file_lock
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LEXICAL_PATH = os.path.join(PROJECT_ROOT, 'lexical_index')
+
+# Keeps identifiers such as "BRCA1", "IL-6", "PMC1234567" or "NCT01234567" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_.:/]")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in into is it its of on or that the their
+there these this to was were which with
+""".split())
+
+
+def tokenize(text):
+    """Lowercased terms of a text; compound identifiers also yield their parts."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if TOKEN_SEPARATORS.search(token):
+            tokens.extend(part for part in TOKEN_SEPARATORS.split(token) if part and part not in STOPWORDS)
+    return tokens
+
+
+def encode_postings(docs, tfs):
+    """Delta-encodes sorted doc numbers and compresses them with their term frequencies."""
+    deltas = np.diff(np.asarray(docs, dtype=np.uint32), prepend=np.uint32(0)).astype(np.uint32)
+    tfs = np.minimum(np.asarray(tfs, dtype=np.uint32), 65535).astype(np.uint16)
+    return zlib.compress(deltas.tobytes() + tfs.tobytes(), 1)
+
+
+def decode_postings(blob, df):
+    raw = zlib.decompress(blob)
+    docs = np.cumsum(np.frombuffer(raw[:4 * df], dtype=np.uint32), dtype=np.uint64).astype(np.uint32)
+    tfs = np.frombuffer(raw[4 * df:], dtype=np.uint16)
+    return docs, tfs
+
+
+class BM25Index:
+    """
+    BM25 inverted index for one namespace, built incrementally.
+
+    Documents are numbered in commit order. Added and deleted documents are
+    kept pending until save() writes them out as a new immutable segment (a
+    lexicon of term -> offset, length, df plus a file of compressed postings);
+    they become searchable then. Once there are more than max_segments
+    segments they are merged into one, which also drops deleted documents from
+    the postings.
+
+    Several processes (the app and bulk_upload.py) may share the directory:
+    save() holds an exclusive lock on the lock file and first reads what other
+    processes committed, so document numbers are assigned against the current
+    state; search() holds a shared lock and picks up new commits the same way.
+
+    Files: ids.txt and lengths.bin (one entry per document), deleted.bin,
+    seg-<n>.json / seg-<n>.bin, and state.json which lists the committed
+    segments and document count.
+    """
+
+    def __init__(self, path, k1=1.2, b=0.75, max_segments=8):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self.state_path = os.path.join(path, 'state.json')
+        self.ids_path = os.path.join(path, 'ids.txt')
+        self.lengths_path = os.path.join(path, 'lengths.bin')
+        self.deleted_path = os.path.join(path, 'deleted.bin')
+        self.lock_path = os.path.join(path, 'lock')
+
+        self.ids = []
+        self.ids_offset = 0
+        self.lengths = array('I')
+        self.alive = bytearray()
+        self.total_length = 0
+        self.doc_numbers = {}
+        self.deleted = set()
+        self.segments = []
+        self.next_segment = 0
+        self.committed_docs = 0
+        self.state_signature = None
+        # Changes made by this process since the last save()
+        self.pending = {}
+        self.pending_deletes = set()
+        self.lock = threading.RLock()
+
+        os.makedirs(path, exist_ok=True)
+        with self.lock:
+            self._refresh()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        with self.lock, file_lock(self.lock_path, exclusive):
+            yield
+
+    def _refresh(self):
+        """Loads documents, deletions and segments committed (by any process) since the last refresh."""
+        try:
+            stat = os.stat(self.state_path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self.state_signature:
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+
+        new_docs = state['docs'] - self.committed_docs
+        if new_docs > 0:
+            with open(self.ids_path, 'rb') as f:
+                f.seek(self.ids_offset)
+                for _ in range(new_docs):
+                    line = f.readline()
+                    self.ids_offset += len(line)
+                    self.ids.append(line.decode('utf-8').rstrip('\n'))
+            with open(self.lengths_path, 'rb') as f:
+                f.seek(4 * self.committed_docs)
+                self.lengths.fromfile(f, new_docs)
+            self.alive.extend(b'\x01' * new_docs)
+            for doc in range(self.committed_docs, state['docs']):
+                self.doc_numbers[self.ids[doc]] = doc
+                self.total_length += self.lengths[doc]
+            self.committed_docs = state['docs']
+
+        if os.path.exists(self.deleted_path):
+            with open(self.deleted_path, 'rb') as f:
+                deleted = array('I', f.read())
+            for doc in set(deleted) - self.deleted:
+                if doc < self.committed_docs:
+                    self._mark_deleted(doc)
+
+        loaded = dict(self.segments)
+        self.segments = []
+        for name in state['segments']:
+            lexicon = loaded.get(name)
+            if lexicon is None:
+                with open(os.path.join(self.path, f"{name}.json")) as f:
+                    lexicon = json.load(f)
+            self.segments.append((name, lexicon))
+        self.next_segment = state['next_segment']
+        self.state_signature = signature
+
+    def add(self, doc_id, text):
+        """Indexes a document at the next save(), replacing any earlier document with the same ID."""
+        terms = tokenize(text)
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        with self.lock:
+            self.pending[doc_id] = (len(terms), counts)
+
+    def delete(self, doc_ids):
+        with self.lock:
+            for doc_id in doc_ids:
+                self.pending.pop(doc_id, None)
+                self.pending_deletes.add(doc_id)
+
+    def _delete(self, doc_id):
+        doc = self.doc_numbers.pop(doc_id, None)
+        if doc is not None:
+            self._mark_deleted(doc)
+
+    def _mark_deleted(self, doc):
+        self.deleted.add(doc)
+        if self.alive[doc]:
+            self.alive[doc] = 0
+            self.total_length -= self.lengths[doc]
+        if self.doc_numbers.get(self.ids[doc]) == doc:
+            del self.doc_numbers[self.ids[doc]]
+
+    def _postings(self, term):
+        """Yields (docs, tfs) arrays for a term from every segment."""
+        for name, lexicon in self.segments:
+            entry = lexicon.get(term)
+            if entry:
+                offset, size, df = entry
+                with open(os.path.join(self.path, f"{name}.bin"), 'rb') as f:
+                    f.seek(offset)
+                    yield decode_postings(f.read(size), df)
+
+    def search(self, query, k=10):
+        """
+        Returns up to k (doc_id, score) pairs ordered by descending BM25 score.
+
+        The work is proportional to the postings of the query terms, not to
+        the number of documents: avgdl and the live document count are kept
+        up to date as documents change, and scores are summed per posting.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._locked(exclusive=False):
+            self._refresh()
+            live_docs = len(self.doc_numbers)
+            if not live_docs:
+                return []
+            avgdl = self.total_length / live_docs or 1.0
+            alive = np.frombuffer(self.alive, dtype=np.bool_)
+            lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+
+            matched_docs = []
+            matched_scores = []
+            for term in terms:
+                postings = list(self._postings(term))
+                if not postings:
+                    continue
+                docs = np.concatenate([p[0] for p in postings]).astype(np.int64)
+                tfs = np.concatenate([p[1] for p in postings]).astype(np.float32)
+                live = alive[docs]
+                docs, tfs = docs[live], tfs[live]
+                if not len(docs):
+                    continue
+                idf = math.log(1 + (live_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs].astype(np.float32) / avgdl)
+                matched_docs.append(docs)
+                matched_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            del alive, lengths
+
+            if not matched_docs:
+                return []
+            docs, inverse = np.unique(np.concatenate(matched_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+            k = min(k, len(docs))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.ids[docs[i]], float(scores[i])) for i in top]
+
+    def save(self):
+        """Commits pending documents as a new segment, merging segments when there are too many."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            for doc_id in self.pending_deletes:
+                self._delete(doc_id)
+            postings = {}
+            for doc_id, (length, counts) in self.pending.items():
+                self._delete(doc_id)
+                doc = len(self.ids)
+                self.ids.append(doc_id)
+                self.lengths.append(length)
+                self.alive.append(1)
+                self.total_length += length
+                self.doc_numbers[doc_id] = doc
+                for term, tf in counts.items():
+                    entry = postings.get(term)
+                    if entry is None:
+                        entry = postings[term] = (array('I'), array('I'))
+                    entry[0].append(doc)
+                    entry[1].append(tf)
+            changed = bool(self.pending or self.pending_deletes)
+            self.pending = {}
+            self.pending_deletes = set()
+
+            if postings:
+                name = f"seg-{self.next_segment}"
+                self.next_segment += 1
+                self._write_segment(name, {
+                    term: (np.frombuffer(docs, dtype=np.uint32), np.frombuffer(tfs, dtype=np.uint32))
+                    for term, (docs, tfs) in postings.items()
+                })
+            if len(self.segments) > self.max_segments:
+                self._merge()
+            elif changed:
+                self._commit()
+
+    def _write_segment(self, name, postings):
+        lexicon = {}
+        offset = 0
+        with open(os.path.join(self.path, f"{name}.bin"), 'wb') as f:
+            for term in sorted(postings):
+                docs, tfs = postings[term]
+                if not len(docs):
+                    continue
+                blob = encode_postings(docs, tfs)
+                f.write(blob)
+                lexicon[term] = (offset, len(blob), len(docs))
+                offset += len(blob)
+        with open(os.path.join(self.path, f"{name}.json"), 'w') as f:
+            json.dump(lexicon, f)
+        self.segments.append((name, lexicon))
+
+    def _merge(self):
+        old_segments = self.segments
+        terms = set()
+        for _, lexicon in old_segments:
+            terms.update(lexicon)
+        alive = np.frombuffer(self.alive, dtype=np.bool_)
+        merged = {}
+        for term in terms:
+            postings = list(self._postings(term))
+            docs = np.concatenate([p[0] for p in postings])
+            tfs = np.concatenate([p[1] for p in postings])
+            keep = alive[docs]
+            merged[term] = (docs[keep], tfs[keep])
+        del alive
+
+        name = f"seg-{self.next_segment}"
+        self.next_segment += 1
+        self.segments = []
+        self._write_segment(name, merged)
+        self._commit()
+        # Readers hold the shared lock while they read segments, so none is using these
+        for old_name, _ in old_segments:
+            for ext in ('json', 'bin'):
+                os.remove(os.path.join(self.path, f"{old_name}.{ext}"))
+
+    def _commit(self):
+        """Appends new document entries and atomically records the committed state."""
+        new_ids = self.ids[self.committed_docs:]
+        if new_ids:
+            # Cut off entries left by a writer that stopped before recording its state
+            data = ''.join(f"{doc_id}\n" for doc_id in new_ids).encode('utf-8')
+            with open(self.ids_path, 'ab') as f:
+                f.truncate(self.ids_offset)
+                f.write(data)
+            self.ids_offset += len(data)
+            with open(self.lengths_path, 'ab') as f:
+                f.truncate(4 * self.committed_docs)
+                self.lengths[self.committed_docs:].tofile(f)
+            self.committed_docs = len(self.ids)
+
+        tmp_path = f"{self.deleted_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            array('I', sorted(self.deleted)).tofile(f)
+        os.replace(tmp_path, self.deleted_path)
+
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'docs': self.committed_docs,
+                'next_segment': self.next_segment,
+                'segments': [name for name, _ in self.segments]
+            }, f)
+        os.replace(tmp_path, self.state_path)
+        stat = os.stat(self.state_path)
+        self.state_signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class LexicalIndex:
+    """BM25 indexes for all namespaces, stored in one directory per namespace."""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('LEXICAL_INDEX_PATH', DEFAULT_LEXICAL_PATH)
+        self.namespaces = {}
+        self.lock = threading.Lock()
+
+    def _namespace(self, namespace):
+        with self.lock:
+            if namespace not in self.namespaces:
+                self.namespaces[namespace] = BM25Index(os.path.join(self.path, namespace))
+            return self.namespaces[namespace]
+
+    def add(self, doc_ids, texts, namespace="ns1"):
+        index = self._namespace(namespace)
+        for doc_id, text in zip(doc_ids, texts):
+            index.add(doc_id, text)
+
+    def delete(self, doc_ids, namespace="ns1"):
+        self._namespace(namespace).delete(doc_ids)
+
+    def search(self, query, k=10, namespace="ns1"):
+        return self._namespace(namespace).search(query, k)
+
+    def save(self):
+        with self.lock:
+            indexes = list(self.namespaces.values())
+        for index in indexes:
+            index.save()
+
+
+def reciprocal_rank_scores(rankings, k=60):
+    """Returns {ID: summed 1 / (k + rank)} over ranked lists of IDs."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuses ranked lists of IDs; returns IDs ordered by summed 1 / (k + rank)."""
+    scores = reciprocal_rank_scores(rankings, k)
+    return sorted(scores, key=scores.get, reverse=True)
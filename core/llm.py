@@ -0,0 +1,40 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LLM:
+    """
+    Interface for answer generation backends.
+
+    generate() returns the whole answer; stream() yields it in pieces as they
+    are produced. A local fake only needs to implement these two methods.
+    """
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str):
+        raise NotImplementedError
+
+
+class GeminiLLM(LLM):
+    def __init__(self, model_name="gemini-1.5-flash", api_key=None):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key or os.getenv('GEMINI_API_KEY'))
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt: str):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. a final safety verdict)
+                continue
+            if text:
+                yield text
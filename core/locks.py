@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path, exclusive=True, blocking=True):
+    """
+    Holds an flock on path (created if missing) between processes.
+
+    Shared locks can be held by several processes at once, an exclusive one
+    by a single process. With blocking=False, BlockingIOError is raised if
+    the lock is taken. Where the platform has no fcntl (Windows) this only
+    opens the file, so callers must still serialize their own threads.
+    """
+    with open(path, 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                        | (0 if blocking else fcntl.LOCK_NB))
+        yield
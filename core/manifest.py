@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+from dotenv import load_dotenv
+
+from core.locks import file_lock
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MANIFEST_PATH = os.path.join(PROJECT_ROOT, 'knowledge_base', 'ingest_manifest.json')
+
+
+def hash_file(pdf_file, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file object's content and rewinds it."""
+    digest = hashlib.sha256()
+    pdf_file.seek(0)
+    for block in iter(lambda: pdf_file.read(block_size), b''):
+        digest.update(block)
+    pdf_file.seek(0)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has been ingested, keyed by namespace and file name.
+
+    Each entry holds the file's content hash, its chunk count and the embedding
+    model name, which is enough to skip unchanged files and to find the stale
+    chunk IDs left behind when a file shrinks.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('INGEST_MANIFEST_PATH', DEFAULT_MANIFEST_PATH)
+        self.lock_path = f"{self.path}.lock"
+        self.lock = threading.Lock()
+        self.entries = {}
+        # Entries changed by this process since the last save(); None marks a removal
+        self.changes = {}
+        self.signature = None
+        with self.lock:
+            self._refresh()
+
+    def _refresh(self):
+        """Reloads the file if another process saved it, keeping this process's unsaved changes."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return
+        with open(self.path, encoding='utf-8') as f:
+            self.entries = json.load(f)
+        self.signature = signature
+        for (namespace, file_name), entry in self.changes.items():
+            self._apply(namespace, file_name, entry)
+
+    def _apply(self, namespace, file_name, entry):
+        if entry is None:
+            self.entries.get(namespace, {}).pop(file_name, None)
+        else:
+            self.entries.setdefault(namespace, {})[file_name] = entry
+
+    def get(self, namespace, file_name):
+        with self.lock:
+            self._refresh()
+            return self.entries.get(namespace, {}).get(file_name)
+
+    def update(self, namespace, file_name, content_hash, chunks, model_name):
+        entry = {'hash': content_hash, 'chunks': chunks, 'model': model_name}
+        with self.lock:
+            self.changes[(namespace, file_name)] = entry
+            self._apply(namespace, file_name, entry)
+
+    def remove(self, namespace, file_name):
+        with self.lock:
+            self.changes[(namespace, file_name)] = None
+            self._apply(namespace, file_name, None)
+
+    def save(self):
+        """
+        Merges this process's changes into the file and writes it atomically.
+
+        The app and bulk_upload.py may both save the manifest, so the file is
+        re-read under an exclusive lock and only the entries changed here are
+        replaced.
+        """
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with file_lock(self.lock_path):
+                self._refresh()
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f)
+                os.replace(tmp_path, self.path)
+                stat = os.stat(self.path)
+                self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                self.changes = {}
@@ -0,0 +1,179 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Stage timings are recorded only with METRICS=1, or inside a profile
+ENABLED = os.getenv('METRICS', '0') == '1'
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_local = threading.local()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in seconds, as exposed to Prometheus."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class Registry:
+    """Histograms of stage durations, keyed by stage name."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self):
+        """Returns all histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP rag_stage_seconds Time spent in each processing stage.",
+            "# TYPE rag_stage_seconds histogram"
+        ]
+        with self.lock:
+            for stage in sorted(self.histograms):
+                histogram = self.histograms[stage]
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'rag_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'rag_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'rag_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            self.histograms = {}
+
+
+registry = Registry()
+
+
+class Trace:
+    """Spans recorded on one thread while it is active, as (stage, start offset, seconds, depth)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+
+class _Span:
+    __slots__ = ('stage', 'start', 'traces')
+
+    def __init__(self, stage, traces):
+        self.stage = stage
+        self.traces = traces
+
+    def __enter__(self):
+        for trace in self.traces:
+            trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        if ENABLED:
+            registry.observe(self.stage, seconds)
+        for trace in self.traces:
+            trace.depth -= 1
+            trace.spans.append((self.stage, self.start - trace.started, seconds, trace.depth))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage):
+    """
+    Times a block as one stage.
+
+    Returns a shared no-op context manager unless metrics are enabled or a
+    trace is active on this thread, so disabled spans cost one function call.
+    """
+    traces = getattr(_local, 'traces', None)
+    if not ENABLED and not traces:
+        return _NO_SPAN
+    return _Span(stage, list(traces or ()))
+
+
+def observe(stage, seconds):
+    """Records a duration measured elsewhere (e.g. in a worker process)."""
+    if ENABLED:
+        registry.observe(stage, seconds)
+
+
+@contextmanager
+def trace():
+    """Collects the spans of the current thread while active: with trace() as t: ...; t.spans."""
+    recorded = Trace()
+    if not hasattr(_local, 'traces'):
+        _local.traces = []
+    _local.traces.append(recorded)
+    try:
+        yield recorded
+    finally:
+        _local.traces.remove(recorded)
+
+
+@contextmanager
+def profile(name, **details):
+    """Writes the spans of one request to PROFILE_DIR as JSON when it is set; otherwise does nothing."""
+    if not PROFILE_DIR:
+        yield
+        return
+    with trace() as recorded:
+        yield
+    report = {
+        'name': name,
+        'details': details,
+        'seconds': time.perf_counter() - recorded.started,
+        'spans': [
+            {'stage': stage, 'start': start, 'seconds': seconds, 'depth': depth}
+            for stage, start, seconds, depth in sorted(recorded.spans, key=lambda s: s[1])
+        ]
+    }
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        file_name = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.json"
+        with open(os.path.join(PROFILE_DIR, file_name), 'w') as f:
+            json.dump(report, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not write profile: {e}")
@@ -0,0 +1,46 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_COLLECTION = 'default'
+# Namespace that all vectors were written to before collections existed
+DEFAULT_NAMESPACE = 'ns1'
+
+
+class Collections:
+    """
+    Named collections of documents, each stored in its own vector store namespace.
+
+    Configured with COLLECTIONS as comma-separated name=namespace pairs, e.g.
+    "default=ns1,pmc=pmc,nlm=nlm,uploads=uploads"; a bare name uses itself as
+    the namespace. Unless configured otherwise, the default collection maps to
+    the original "ns1" namespace so existing indexes stay searchable.
+    """
+
+    def __init__(self, spec=None):
+        spec = spec if spec is not None else os.getenv('COLLECTIONS', '')
+        self.mapping = {DEFAULT_COLLECTION: DEFAULT_NAMESPACE}
+        for entry in spec.split(','):
+            name, _, namespace = entry.strip().partition('=')
+            if name:
+                self.mapping[name.strip()] = namespace.strip() or name.strip()
+
+    @property
+    def names(self):
+        return list(self.mapping)
+
+    def namespace(self, collection=None):
+        """Returns the namespace of a collection (the default one for None); raises ValueError if unknown."""
+        name = collection or DEFAULT_COLLECTION
+        if name not in self.mapping:
+            raise ValueError(f"Unknown collection '{name}' (configured: {', '.join(self.mapping)})")
+        return self.mapping[name]
+
+    def namespaces(self, collections=None):
+        """Returns the distinct namespaces of some collections, or of all of them for None."""
+        if not collections:
+            collections = self.names
+        elif isinstance(collections, str):
+            collections = [collections]
+        return list(dict.fromkeys(self.namespace(name) for name in collections))
@@ -0,0 +1,334 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from core import metrics
+from core.manifest import hash_file
+from core.text_cache import function_key
+from core.upsert import UpsertClient
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class PdfSource:
+    """
+    A PDF on disk that is only opened when a parse worker reads it.
+
+    Only the path is pickled when it is sent to a worker process, so queueing
+    sources costs no memory regardless of file size.
+    """
+
+    def __init__(self, path, name=None):
+        self.path = str(path)
+        self.name = name or os.path.basename(self.path)
+
+    def open(self):
+        return open(self.path, 'rb')
+
+
+class ProgressReporter:
+    """on_file_done callback for command-line scripts: prints one line per finished file and keeps running totals."""
+
+    def __init__(self):
+        self.counts = {'ingested': 0, 'skipped': 0, 'failed': 0}
+
+    def __call__(self, file_name, status, chunks, error):
+        self.counts[status] += 1
+        done = sum(self.counts.values())
+        if status == 'ingested':
+            print(f"[{done}] Processed {file_name}: {chunks} chunks")
+        elif status == 'skipped':
+            print(f"[{done}] Skipped unchanged {file_name}: {chunks} chunks")
+        else:
+            print(f"[{done}] Failed {file_name}: {error}")
+
+
+@contextmanager
+def open_pdf(pdf_file):
+    """Yields a readable binary stream for a PdfSource or an already open file object."""
+    if isinstance(pdf_file, PdfSource):
+        with pdf_file.open() as f:
+            yield f
+    else:
+        pdf_file.seek(0)
+        yield pdf_file
+
+
+def parse_pdf(pdf_file, extract_text_func, split_text_func, skip_hash=None, text_cache=None):
+    """
+    Hashes, extracts and splits one PDF. Runs in a worker process.
+
+    extract_text_func returns the document text, or a list of page texts that
+    are joined with spaces. Returns (content_hash, chunks). Chunks are None
+    when the content hash equals skip_hash, i.e. the file is unchanged since
+    it was last ingested. With a text_cache, cached chunks or pages for the
+    same content and functions are used instead of parsing the PDF again.
+    """
+    with open_pdf(pdf_file) as f:
+        content_hash = hash_file(f)
+        if content_hash == skip_hash:
+            return content_hash, None
+        if text_cache is None:
+            return content_hash, split_text_func(join_pages(extract_text_func(f)))
+
+        extract_key = function_key(extract_text_func)
+        split_key = function_key(split_text_func)
+        chunks = text_cache.get_chunks(content_hash, extract_key, split_key)
+        if chunks is not None:
+            return content_hash, chunks
+        pages = text_cache.get_pages(content_hash, extract_key)
+        if pages is None:
+            pages = extract_text_func(f)
+            text_cache.set_pages(content_hash, extract_key, pages)
+
+    chunks = split_text_func(join_pages(pages))
+    text_cache.set_chunks(content_hash, extract_key, split_key, chunks)
+    return content_hash, chunks
+
+
+def parse_pdf_with_spans(*args):
+    """Runs parse_pdf and returns (result, [(stage, seconds)]) so a worker's timings reach the parent's metrics."""
+    if not metrics.ENABLED:
+        return parse_pdf(*args), []
+    with metrics.trace() as recorded:
+        with metrics.span('ingest.parse'):
+            result = parse_pdf(*args)
+    return result, [(stage, seconds) for stage, _, seconds, _ in recorded.spans]
+
+
+def join_pages(pages):
+    return pages if isinstance(pages, str) else ' '.join(pages)
+
+
+def vector_id_prefix(file_name):
+    """Builds the vector ID prefix for a file: its name without extension, made safe for IDs."""
+    filename = os.path.splitext(file_name)[0]
+    return filename.replace(' ', '-').replace('/', '_').replace('\\', '_')
+
+
+class IngestionPipeline:
+    """
+    Staged PDF ingestion connected by bounded queues:
+
+      parse  - extract_text_func and split_text_func in a process pool
+      embed  - a dedicated thread running EmbeddingManager.embed_chunks, which
+               only runs the model for chunks not in the embedding cache
+      upsert - an UpsertClient sending size-bounded requests concurrently,
+               with retries on rate limits and server errors
+
+    The feeder blocks once queue_size documents are waiting to be embedded, and
+    the embed thread blocks once max_pending_upserts requests are in flight, so
+    memory stays flat however many files are fed in.
+
+    When the embedding manager has a lexical index, chunks are added to it as
+    they are embedded and it is saved together with the manifest.
+
+    With a text_cache, extracted pages and chunks are reused across runs, so
+    re-ingesting with a different split function does not parse PDFs again.
+
+    With a manifest, files whose content hash and model are unchanged are
+    skipped, and a re-ingested file that shrank has its stale tail IDs deleted.
+    on_file_done(file_name, status, chunks, error) is called once per file with
+    status 'ingested', 'skipped' or 'failed', and on_vectors_upserted(file_name,
+    count) after each successful upsert request.
+    """
+
+    def __init__(self, embedding_manager, extract_text_func, split_text_func, namespace="ns1",
+                 parse_workers=None, upsert_workers=None, queue_size=None, max_pending_upserts=None,
+                 manifest=None, force=False, text_cache=None, on_file_done=None,
+                 on_vectors_upserted=None, save_interval=30):
+        self.embedding_manager = embedding_manager
+        self.extract_text_func = extract_text_func
+        self.split_text_func = split_text_func
+        self.namespace = namespace
+        self.parse_workers = parse_workers or int(os.getenv('INGEST_PARSE_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+        self.upsert_workers = upsert_workers or int(os.getenv('INGEST_UPSERT_WORKERS', 4))
+        self.queue_size = queue_size or 2 * self.parse_workers
+        self.max_pending_upserts = max_pending_upserts or 4 * self.upsert_workers
+        self.manifest = manifest
+        self.force = force
+        self.text_cache = text_cache
+        self.on_file_done = on_file_done
+        self.on_vectors_upserted = on_vectors_upserted
+        self.save_interval = save_interval
+
+        self.chunks_per_file = {}
+        self.errors = {}
+        self.skipped = []
+        self.upsert_stats = {}
+        self.lock = threading.Lock()
+        self.last_index_save = time.monotonic()
+
+    def run(self, pdf_files):
+        """
+        Ingests an iterable of PdfSource or named file objects, consumed lazily.
+
+        Returns a dict mapping file name to chunk count for every file that was
+        fully upserted or skipped as unchanged. Files that failed are left out
+        and listed in self.errors.
+        """
+        parsed = queue.Queue(maxsize=self.queue_size)
+        upsert_client = UpsertClient(
+            self.embedding_manager.upload_vectors,
+            max_concurrency=self.upsert_workers,
+            max_pending=self.max_pending_upserts
+        )
+        self.pending = {}
+        self.file_state = {}
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+            embed_thread = threading.Thread(
+                target=self._embed_worker, args=(parsed, upsert_client),
+                name='ingest-embed', daemon=True
+            )
+            embed_thread.start()
+
+            try:
+                for pdf_file in pdf_files:
+                    previous = self.manifest.get(self.namespace, pdf_file.name) if self.manifest else None
+                    skip_hash = None
+                    if previous and not self.force and previous['model'] == self.embedding_manager.model_name:
+                        skip_hash = previous['hash']
+                    future = parse_pool.submit(parse_pdf_with_spans, pdf_file, self.extract_text_func,
+                                               self.split_text_func, skip_hash, self.text_cache)
+                    parsed.put((pdf_file.name, previous, future))
+            finally:
+                parsed.put(_DONE)
+                embed_thread.join()
+                upsert_client.close()
+
+        self.upsert_stats = upsert_client.stats()
+        logger.info(
+            f"Upserted {self.upsert_stats['vectors']} vectors in {self.upsert_stats['requests']} requests "
+            f"({self.upsert_stats['vectors_per_second']:.1f} vectors/s, {self.upsert_stats['retries']} retries)"
+        )
+        self._save_indexes()
+        return dict(self.chunks_per_file)
+
+    def _embed_worker(self, parsed, upsert_client):
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                return
+            file_name, previous, future = item
+            try:
+                (content_hash, chunks), spans = future.result()
+                for stage, seconds in spans:
+                    metrics.observe(stage, seconds)
+                if chunks is None:
+                    self._skip(file_name, previous['chunks'])
+                    continue
+                embeddings = self.embedding_manager.embed_chunks(chunks).tolist()
+            except Exception as e:
+                self._fail(file_name, e)
+                continue
+
+            prefix = vector_id_prefix(file_name)
+            vectors = [
+                {
+                    "id": f"{prefix}-chunk-{chunk_index}",
+                    "values": embeddings[chunk_index],
+                    "metadata": {
+                        "chunk": chunk,
+                        "file_name": file_name,
+                        "chunk_index": chunk_index
+                    }
+                }
+                for chunk_index, chunk in enumerate(chunks)
+            ]
+
+            lexical_index = self.embedding_manager.lexical_index
+            if lexical_index:
+                lexical_index.add([vector["id"] for vector in vectors], chunks, self.namespace)
+
+            with self.lock:
+                self.file_state[file_name] = (content_hash, previous['chunks'] if previous else 0)
+            if not vectors:
+                self._finish(file_name, 0)
+                continue
+
+            requests = upsert_client.pack(vectors)
+            with self.lock:
+                self.pending[file_name] = len(requests)
+            for request, request_bytes in requests:
+                upsert_future = upsert_client.submit_request(request, request_bytes, self.namespace)
+                upsert_future.add_done_callback(
+                    lambda f, name=file_name, count=len(chunks): self._upserted(f, name, count)
+                )
+
+    def _upserted(self, future, file_name, chunk_count):
+        error = future.exception()
+        if error is None and self.on_vectors_upserted:
+            self.on_vectors_upserted(file_name, future.result())
+        with self.lock:
+            if file_name not in self.pending:
+                return
+            if error is None:
+                self.pending[file_name] -= 1
+                if self.pending[file_name]:
+                    return
+        if error is not None:
+            self._fail(file_name, error)
+        else:
+            self._finish(file_name, chunk_count)
+
+    def _finish(self, file_name, chunk_count):
+        with self.lock:
+            self.pending.pop(file_name, None)
+            content_hash, previous_chunks = self.file_state.pop(file_name)
+
+        try:
+            if previous_chunks > chunk_count:
+                prefix = vector_id_prefix(file_name)
+                stale_ids = [f"{prefix}-chunk-{i}" for i in range(chunk_count, previous_chunks)]
+                self.embedding_manager.delete_vectors(stale_ids, self.namespace)
+        except Exception as e:
+            self._fail(file_name, e)
+            return
+
+        with self.lock:
+            self.chunks_per_file[file_name] = chunk_count
+        if self.manifest:
+            self.manifest.update(self.namespace, file_name, content_hash, chunk_count,
+                                 self.embedding_manager.model_name)
+        self._maybe_save_indexes()
+        self._notify(file_name, 'ingested', chunk_count, None)
+
+    def _skip(self, file_name, chunk_count):
+        with self.lock:
+            self.chunks_per_file[file_name] = chunk_count
+            self.skipped.append(file_name)
+        self._notify(file_name, 'skipped', chunk_count, None)
+
+    def _fail(self, file_name, error):
+        logger.error(f"Failed to ingest {file_name}: {error}")
+        with self.lock:
+            self.pending.pop(file_name, None)
+            self.file_state.pop(file_name, None)
+            self.errors[file_name] = str(error)
+        self._notify(file_name, 'failed', 0, str(error))
+
+    def _notify(self, file_name, status, chunks, error):
+        if self.on_file_done:
+            self.on_file_done(file_name, status, chunks, error)
+
+    def _maybe_save_indexes(self):
+        with self.lock:
+            if time.monotonic() - self.last_index_save < self.save_interval:
+                return
+            self.last_index_save = time.monotonic()
+        self._save_indexes()
+
+    def _save_indexes(self):
+        # The lexical index goes first so the manifest never records a file
+        # whose chunks are missing from it
+        if self.embedding_manager.lexical_index:
+            self.embedding_manager.lexical_index.save()
+        if self.manifest:
+            self.manifest.save()
@@ -0,0 +1,107 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+from core.locks import file_lock
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SESSION_DIR = os.path.join(PROJECT_ROOT, 'chat_sessions')
+
+SESSION_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class ChatSessionStore:
+    """
+    Server-side chat histories keyed by session ID.
+
+    The browser keeps only the session ID, so a message round trip carries the
+    new message rather than the whole conversation. Each session is a JSON
+    list of (role, text) pairs in session_dir, read and rewritten under a file
+    lock, so every worker process sees the same history. At most max_sessions
+    are kept (least recently used are dropped first), each holds its last
+    max_messages messages, and idle sessions expire after ttl seconds.
+    """
+
+    def __init__(self, session_dir=None, max_sessions=None, max_messages=None, ttl=None):
+        self.session_dir = session_dir or os.getenv('CHAT_SESSION_DIR', DEFAULT_SESSION_DIR)
+        self.max_sessions = max_sessions or int(os.getenv('CHAT_SESSION_MAX', 1000))
+        self.max_messages = max_messages or int(os.getenv('CHAT_SESSION_MAX_MESSAGES', 200))
+        self.ttl = ttl or float(os.getenv('CHAT_SESSION_TTL', 86400))
+        self.lock = threading.Lock()
+        os.makedirs(self.session_dir, exist_ok=True)
+
+    def create(self):
+        session_id = uuid.uuid4().hex
+        self._expire()
+        with open(self._path(session_id), 'w', encoding='utf-8') as f:
+            json.dump([], f)
+        return session_id
+
+    def messages(self, session_id):
+        """
+        Returns the session's messages, or None for an ID that create() cannot have made.
+
+        An unknown or expired session has no messages; its ID stays usable, so
+        a reload that reaches another worker keeps the browser's session.
+        """
+        path = self._path(session_id)
+        if path is None:
+            return None
+        if not os.path.exists(path):
+            return []
+        with self.lock, file_lock(path, exclusive=False):
+            messages = self._read(path)
+            os.utime(path)
+        return [tuple(message) for message in messages]
+
+    def append(self, session_id, role, text):
+        """Adds a message, recreating the session if it has expired in the meantime."""
+        path = self._path(session_id)
+        if path is None:
+            raise ValueError(f"Invalid session ID {session_id!r}")
+        with self.lock, file_lock(path):
+            messages = self._read(path)
+            messages.append((role, text))
+            del messages[:-self.max_messages]
+            # Rewritten in place: replacing the file would leave waiters locking the old one
+            with open(path, 'r+', encoding='utf-8') as f:
+                json.dump(messages, f)
+                f.truncate()
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding='utf-8') as f:
+            data = f.read()
+        # A session that file_lock() has just created is still empty
+        return json.loads(data) if data else []
+
+    def _path(self, session_id):
+        # Session IDs come from clients; only accept the ones create() makes
+        if not isinstance(session_id, str) or not SESSION_ID.fullmatch(session_id):
+            return None
+        return os.path.join(self.session_dir, f"{session_id}.json")
+
+    def _expire(self):
+        sessions = []
+        for name in os.listdir(self.session_dir):
+            try:
+                sessions.append((os.path.getmtime(os.path.join(self.session_dir, name)), name))
+            except OSError:
+                continue
+        sessions.sort()
+        cutoff = time.time() - self.ttl
+        # Least recently used first; one slot is kept for the session being created
+        excess = len(sessions) - self.max_sessions + 1
+        for i, (last_used, name) in enumerate(sessions):
+            if i >= excess and last_used >= cutoff:
+                break
+            try:
+                os.remove(os.path.join(self.session_dir, name))
+            except OSError:
+                continue
@@ -0,0 +1,112 @@
+import os
+import re
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STREAM_DIR = os.path.join(PROJECT_ROOT, 'chat_streams')
+
+STREAM_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class StreamBuffer:
+    """Text produced so far by one streaming generation, and whether it has finished."""
+
+    def __init__(self, text, done):
+        self._text = text
+        self.done = done
+
+    def text(self):
+        return self._text
+
+
+class StreamRegistry:
+    """
+    Server-side buffers for generations that the browser polls.
+
+    start() drains a text iterator on a background thread into a new buffer
+    and returns its ID. A buffer is a file in stream_dir, appended to as text
+    arrives and renamed from <id>.part to <id>.txt when the generation
+    finishes, so a poll can be answered by any worker process. At most
+    max_streams buffers are kept; the oldest are dropped first, and abandoned
+    ones expire after ttl seconds.
+    """
+
+    def __init__(self, stream_dir=None, max_streams=256, ttl=600):
+        self.stream_dir = stream_dir or os.getenv('CHAT_STREAM_DIR', DEFAULT_STREAM_DIR)
+        self.max_streams = max_streams
+        self.ttl = ttl
+        os.makedirs(self.stream_dir, exist_ok=True)
+
+    def start(self, pieces):
+        stream_id = uuid.uuid4().hex
+        self._expire()
+        part_path = self._path(stream_id, 'part')
+        open(part_path, 'wb').close()
+
+        def drain():
+            try:
+                with open(part_path, 'ab') as f:
+                    for piece in pieces:
+                        f.write(piece.encode('utf-8'))
+                        f.flush()
+            finally:
+                try:
+                    os.replace(part_path, self._path(stream_id, 'txt'))
+                except FileNotFoundError:
+                    pass  # Discarded or expired meanwhile
+
+        threading.Thread(target=drain, name=f'stream-{stream_id[:8]}', daemon=True).start()
+        return stream_id
+
+    def get(self, stream_id):
+        """Returns a snapshot of a stream's buffer, or None for an unknown stream."""
+        if not isinstance(stream_id, str) or not STREAM_ID.fullmatch(stream_id):
+            return None
+        for extension, done in (('txt', True), ('part', False)):
+            try:
+                with open(self._path(stream_id, extension), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            # An unfinished buffer may end inside a character that is still being written
+            return StreamBuffer(data.decode('utf-8', errors='strict' if done else 'ignore'), done)
+        # The generation may have finished between the two reads
+        if os.path.exists(self._path(stream_id, 'txt')):
+            return self.get(stream_id)
+        return None
+
+    def discard(self, stream_id):
+        if not isinstance(stream_id, str) or not STREAM_ID.fullmatch(stream_id):
+            return
+        for extension in ('txt', 'part'):
+            try:
+                os.remove(self._path(stream_id, extension))
+            except FileNotFoundError:
+                pass
+
+    def _path(self, stream_id, extension):
+        return os.path.join(self.stream_dir, f"{stream_id}.{extension}")
+
+    def _expire(self):
+        buffers = []
+        for name in os.listdir(self.stream_dir):
+            try:
+                buffers.append((os.path.getmtime(os.path.join(self.stream_dir, name)), name))
+            except OSError:
+                continue
+        buffers.sort()
+        cutoff = time.time() - self.ttl
+        # Oldest first; one slot is kept for the stream being started
+        excess = len(buffers) - self.max_streams + 1
+        for i, (modified, name) in enumerate(buffers):
+            if i >= excess and modified >= cutoff:
+                break
+            try:
+                os.remove(os.path.join(self.stream_dir, name))
+            except OSError:
+                continue
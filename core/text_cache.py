@@ -0,0 +1,80 @@
+import functools
+import hashlib
+import json
+import os
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TEXT_CACHE_PATH = os.path.join(PROJECT_ROOT, 'text_cache')
+
+
+def function_key(func):
+    """
+    Identifies an extract or split function and its parameters.
+
+    Covers the function's qualified name, its default arguments, a version
+    attribute if it has one, and the bound arguments of a functools.partial,
+    so that split_text with a different chunk size gets a different key.
+    """
+    if isinstance(func, functools.partial):
+        return f"{function_key(func.func)}({func.args!r}, {sorted(func.keywords.items())!r})"
+    key = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    key += f"{getattr(func, '__defaults__', None)!r}{getattr(func, '__kwdefaults__', None)!r}"
+    version = getattr(func, 'version', None)
+    return f"{key}@{version}" if version else key
+
+
+class TextCache:
+    """
+    On-disk cache of extracted PDF text and of the chunks split from it.
+
+    Two layers, both keyed by the PDF's content hash:
+
+      pages/  - the extract function's output (per-page text), keyed by the
+                extract function
+      chunks/ - the split function's output, keyed by the extract and split
+                functions together
+
+    Entries are zlib-compressed JSON written atomically, so parse worker
+    processes can share the cache. Only the path is pickled when the cache is
+    sent to a worker.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('TEXT_CACHE_PATH', DEFAULT_TEXT_CACHE_PATH)
+
+    def _entry_path(self, layer, *parts):
+        key = hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+        return os.path.join(self.path, layer, key[:2], f"{key}.zlib")
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (zlib.error, ValueError):
+            # A corrupt entry is treated as a miss and rewritten
+            return None
+
+    def _write(self, path, value):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'), 6))
+        os.replace(tmp_path, path)
+
+    def get_pages(self, content_hash, extract_key):
+        return self._read(self._entry_path('pages', content_hash, extract_key))
+
+    def set_pages(self, content_hash, extract_key, pages):
+        self._write(self._entry_path('pages', content_hash, extract_key), pages)
+
+    def get_chunks(self, content_hash, extract_key, split_key):
+        return self._read(self._entry_path('chunks', content_hash, extract_key, split_key))
+
+    def set_chunks(self, content_hash, extract_key, split_key, chunks):
+        self._write(self._entry_path('chunks', content_hash, extract_key, split_key), chunks)
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_UPLOAD_DIR = os.path.join(PROJECT_ROOT, 'uploads')
+
+READ_SIZE = 1024 * 1024
+UPLOAD_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class UploadStore:
+    """
+    Files uploaded in chunks, written straight to disk.
+
+    create() reserves an upload for a file of known size; write() appends the
+    body of one request at a given offset, reading it in READ_SIZE pieces, so
+    memory use does not depend on the file or chunk size. A client resumes an
+    interrupted upload by asking info() for the offset the server has. Uploads
+    not finished within ttl seconds are deleted.
+    """
+
+    def __init__(self, upload_dir=None, max_bytes=None, ttl=None):
+        self.upload_dir = upload_dir or os.getenv('UPLOAD_DIR', DEFAULT_UPLOAD_DIR)
+        self.max_bytes = max_bytes or int(os.getenv('UPLOAD_MAX_BYTES', 2 * 1024 ** 3))
+        self.ttl = ttl or float(os.getenv('UPLOAD_TTL', 86400))
+        self.writing = set()
+        self.lock = threading.Lock()
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+    def create(self, filename, size):
+        """Returns the ID of a new upload; raises ValueError for a file that cannot be accepted."""
+        filename = os.path.basename(filename or '')
+        if not filename.lower().endswith('.pdf'):
+            raise ValueError("Only PDF files can be uploaded")
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError("File size must be a positive number of bytes")
+        if size > self.max_bytes:
+            raise ValueError(f"File is larger than the {self.max_bytes} byte limit")
+
+        self._expire()
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(self.upload_dir, upload_id)
+        os.makedirs(path)
+        with open(os.path.join(path, 'upload.json'), 'w', encoding='utf-8') as f:
+            json.dump({'filename': filename, 'size': size, 'created_at': time.time()}, f)
+        open(os.path.join(path, 'data'), 'wb').close()
+        return upload_id
+
+    def info(self, upload_id):
+        """Returns the file name, size and bytes received so far, or None for an unknown upload."""
+        path = self._path(upload_id)
+        if path is None:
+            return None
+        try:
+            with open(os.path.join(path, 'upload.json'), encoding='utf-8') as f:
+                info = json.load(f)
+            info['offset'] = os.path.getsize(os.path.join(path, 'data'))
+        except FileNotFoundError:
+            return None
+        info['complete'] = info['offset'] == info['size']
+        return info
+
+    def write(self, upload_id, offset, stream):
+        """
+        Appends stream to an upload whose received size is offset; returns the new offset.
+
+        Raises KeyError for an unknown upload and ValueError if offset is not
+        where the upload stands (the client should resume from info()) or
+        another request is writing to it.
+        """
+        with self.lock:
+            if upload_id in self.writing:
+                raise ValueError("Another request is writing to this upload")
+            self.writing.add(upload_id)
+        try:
+            info = self.info(upload_id)
+            if info is None:
+                raise KeyError(upload_id)
+            if offset != info['offset']:
+                raise ValueError(f"Upload is at offset {info['offset']}, not {offset}")
+            remaining = info['size'] - offset
+            with open(os.path.join(self._path(upload_id), 'data'), 'ab') as f:
+                while remaining > 0:
+                    data = stream.read(min(READ_SIZE, remaining))
+                    if not data:
+                        break
+                    f.write(data)
+                    remaining -= len(data)
+            return info['size'] - remaining
+        finally:
+            with self.lock:
+                self.writing.discard(upload_id)
+
+    def completed_file(self, upload_id):
+        """Returns (file name, path) of a complete upload; raises KeyError or ValueError otherwise."""
+        info = self.info(upload_id)
+        if info is None:
+            raise KeyError(upload_id)
+        if not info['complete']:
+            raise ValueError(f"{info['filename']} has {info['offset']} of {info['size']} bytes")
+        return info['filename'], os.path.join(self._path(upload_id), 'data')
+
+    def discard(self, upload_id):
+        path = self._path(upload_id)
+        if path is not None:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _path(self, upload_id):
+        # Upload IDs come from clients; only accept the ones create() makes
+        if not isinstance(upload_id, str) or not UPLOAD_ID.fullmatch(upload_id):
+            return None
+        return os.path.join(self.upload_dir, upload_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for upload_id in os.listdir(self.upload_dir):
+            path = os.path.join(self.upload_dir, upload_id)
+            try:
+                if os.path.getmtime(os.path.join(path, 'data')) < cutoff:
+                    logger.info(f"Deleting abandoned upload {upload_id}")
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
@@ -0,0 +1,166 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Pinecone rejects requests over 2 MB and metadata over 40 KB per vector
+DEFAULT_MAX_REQUEST_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_METADATA_BYTES = 40 * 1024
+# Upper bound on the JSON size of one float in a request body
+BYTES_PER_VALUE = 24
+
+
+def error_status(error):
+    """Returns the HTTP status carried by a client exception, if any."""
+    for attr in ('status', 'status_code', 'code'):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error):
+    """Rate limits, server errors and dropped connections are worth retrying."""
+    status = error_status(error)
+    if status is not None:
+        return status == 429 or 500 <= status < 600
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class UpsertClient:
+    """
+    Sends vectors through upsert_func(vectors, namespace) in size-bounded,
+    concurrent requests.
+
+    Vectors are packed into requests of at most max_request_bytes (estimated
+    JSON size) and max_vectors_per_request. Up to max_concurrency requests run
+    at once; submit() blocks when max_pending requests are queued. Requests
+    failing with 429, 5xx or a connection error are retried with full-jitter
+    exponential backoff.
+    """
+
+    def __init__(self, upsert_func, max_concurrency=8, max_pending=None,
+                 max_request_bytes=DEFAULT_MAX_REQUEST_BYTES, max_vectors_per_request=1000,
+                 max_metadata_bytes=DEFAULT_MAX_METADATA_BYTES,
+                 max_retries=6, base_delay=0.5, max_delay=30.0):
+        self.upsert_func = upsert_func
+        self.max_request_bytes = max_request_bytes
+        self.max_vectors_per_request = max_vectors_per_request
+        self.max_metadata_bytes = max_metadata_bytes
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='upsert')
+        self.slots = threading.BoundedSemaphore(max_pending or 2 * max_concurrency)
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.vectors = 0
+        self.bytes = 0
+        self.retries = 0
+        self.failures = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def estimate_size(self, vector):
+        metadata = vector.get('metadata') or {}
+        return (len(vector['id']) + BYTES_PER_VALUE * len(vector['values'])
+                + len(json.dumps(metadata)) + 64)
+
+    def fit_metadata(self, vector):
+        """Truncates metadata["chunk"] so the vector's metadata stays under max_metadata_bytes."""
+        metadata = vector.get('metadata') or {}
+        chunk = metadata.get('chunk')
+        size = len(json.dumps(metadata, ensure_ascii=False).encode('utf-8'))
+        if not isinstance(chunk, str) or size <= self.max_metadata_bytes:
+            return vector
+        encoded = chunk.encode('utf-8')
+        original_bytes = len(encoded)
+        truncated = chunk
+        while size > self.max_metadata_bytes and encoded:
+            encoded = encoded[:max(0, len(encoded) - (size - self.max_metadata_bytes))]
+            truncated = encoded.decode('utf-8', errors='ignore')
+            size = len(json.dumps({**metadata, 'chunk': truncated}, ensure_ascii=False).encode('utf-8'))
+        logger.warning(f"Truncated metadata chunk of {vector['id']} from {original_bytes} to {len(encoded)} bytes")
+        return {**vector, 'metadata': {**metadata, 'chunk': truncated}}
+
+    def pack(self, vectors):
+        """Splits vectors into request-sized lists of (vectors, estimated bytes)."""
+        requests = []
+        batch, batch_bytes = [], 0
+        for vector in vectors:
+            vector = self.fit_metadata(vector)
+            size = self.estimate_size(vector)
+            if batch and (batch_bytes + size > self.max_request_bytes
+                          or len(batch) >= self.max_vectors_per_request):
+                requests.append((batch, batch_bytes))
+                batch, batch_bytes = [], 0
+            batch.append(vector)
+            batch_bytes += size
+        if batch:
+            requests.append((batch, batch_bytes))
+        return requests
+
+    def submit(self, vectors, namespace="ns1"):
+        """Queues vectors for upsert and returns one future per request."""
+        return [self.submit_request(batch, batch_bytes, namespace)
+                for batch, batch_bytes in self.pack(vectors)]
+
+    def submit_request(self, batch, batch_bytes, namespace="ns1"):
+        """Queues one request produced by pack(), blocking while max_pending requests are queued."""
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+        self.slots.acquire()
+        future = self.executor.submit(self._send, batch, batch_bytes, namespace)
+        future.add_done_callback(lambda f: self.slots.release())
+        return future
+
+    def _send(self, batch, batch_bytes, namespace):
+        attempt = 0
+        while True:
+            try:
+                self.upsert_func(batch, namespace)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    with self.lock:
+                        self.failures += 1
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                logger.warning(f"Upsert of {len(batch)} vectors failed ({e}), retrying in {delay:.2f}s")
+                with self.lock:
+                    self.retries += 1
+                attempt += 1
+                time.sleep(delay)
+
+        with self.lock:
+            self.requests += 1
+            self.vectors += len(batch)
+            self.bytes += batch_bytes
+            self.finished_at = time.monotonic()
+        return len(batch)
+
+    def close(self):
+        """Waits for queued requests to finish and stops the worker threads."""
+        self.executor.shutdown(wait=True)
+
+    def stats(self):
+        with self.lock:
+            elapsed = (self.finished_at - self.started_at) if self.started_at and self.finished_at else 0.0
+            return {
+                'requests': self.requests,
+                'vectors': self.vectors,
+                'bytes': self.bytes,
+                'retries': self.retries,
+                'failures': self.failures,
+                'seconds': elapsed,
+                'vectors_per_second': self.vectors / elapsed if elapsed else 0.0,
+                'bytes_per_second': self.bytes / elapsed if elapsed else 0.0
+            }
@@ -0,0 +1,490 @@
+import json
+import os
+import threading
+from array import array
+from contextlib import contextmanager
+import numpy as np
+from dotenv import load_dotenv
+
+from core.locks import file_lock
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LOCAL_PATH = os.path.join(PROJECT_ROOT, 'vector_store')
+
+
+class VectorStore:
+    """
+    Interface shared by all vector store backends.
+
+    Vectors are dicts of the form {"id", "values", "metadata"}. Queries return
+    {"matches": [{"id", "score", "metadata"}, ...]} ordered by descending score,
+    and fetches return {id: {"values", "metadata"}} for the IDs that exist.
+    """
+
+    def upsert(self, vectors, namespace="ns1"):
+        raise NotImplementedError
+
+    def query(self, vector, top_k=10, namespace="ns1", include_metadata=True):
+        raise NotImplementedError
+
+    def fetch(self, ids, namespace="ns1"):
+        raise NotImplementedError
+
+    def delete(self, ids, namespace="ns1"):
+        raise NotImplementedError
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self, api_key=None, index_name=None):
+        from pinecone import Pinecone
+
+        self.pc = Pinecone(api_key=api_key or os.getenv('PINECONE_API_KEY'))
+        self.index = self.pc.Index(index_name or os.getenv('PINECONE_INDEX_NAME'))
+
+    def upsert(self, vectors, namespace="ns1"):
+        self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k=10, namespace="ns1", include_metadata=True):
+        response = self.index.query(
+            namespace=namespace,
+            vector=vector,
+            top_k=top_k,
+            include_values=False,
+            include_metadata=include_metadata
+        )
+        return {
+            'matches': [
+                {
+                    'id': match.get('id'),
+                    'score': match.get('score'),
+                    'metadata': match.get('metadata') or {}
+                }
+                for match in response.get('matches', [])
+            ]
+        }
+
+    def fetch(self, ids, namespace="ns1"):
+        if not ids:
+            return {}
+        response = self.index.fetch(ids=list(ids), namespace=namespace)
+        return {
+            vector_id: {
+                'values': list(vector.get('values') or []),
+                'metadata': vector.get('metadata') or {}
+            }
+            for vector_id, vector in response.get('vectors', {}).items()
+        }
+
+    def delete(self, ids, namespace="ns1"):
+        if ids:
+            self.index.delete(ids=list(ids), namespace=namespace)
+
+
+class _LocalNamespace:
+    """
+    One namespace of a LocalVectorStore.
+
+    Files in the namespace directory:
+      vectors.bin   - row-major matrix of unit-normalized vectors, appended to
+      records.jsonl - one line per row ({"id", "metadata"}) or deletion ({"delete"})
+      ivf.npz       - IVF centroids and per-row list assignments, once trained
+
+    Upserting an existing id appends a new row and retires the old one, so the
+    files only ever grow until compact() is called.
+
+    Several processes may share the directory (the app and bulk_upload.py).
+    Writes hold an exclusive lock on the lock file and reads a shared one, and
+    both first apply the records other processes appended (or reload
+    everything if the files were compacted), so rows are always numbered
+    against the current files. A record line is written after its vector, so
+    a row is visible only once both are complete.
+    """
+
+    def __init__(self, path, dtype, nprobe, min_train_size):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.vectors_path = os.path.join(path, 'vectors.bin')
+        self.records_path = os.path.join(path, 'records.jsonl')
+        self.ivf_path = os.path.join(path, 'ivf.npz')
+        self.info_path = os.path.join(path, 'info.json')
+        self.lock_path = os.path.join(path, 'lock')
+
+        self.dim = None
+        self.generation = 0
+        self.training = False
+        self.lock = threading.RLock()
+        self._reset()
+
+        os.makedirs(path, exist_ok=True)
+        with self.lock:
+            self._refresh()
+
+    def _reset(self):
+        self.ids = []
+        self.offsets = array('Q')
+        self.rows = {}
+        self.live = np.zeros(0, dtype=bool)
+        self.vectors = None
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists = []
+        self.trained_size = 0
+        self.records_size = 0
+        self.records_inode = None
+        self.ivf_signature = None
+        self.generation += 1
+
+    @contextmanager
+    def _locked(self, exclusive):
+        with self.lock, file_lock(self.lock_path, exclusive):
+            yield
+
+    def _refresh(self):
+        """Applies the records (and IVF index) written by any process since the last refresh."""
+        if self.dim is None and os.path.exists(self.info_path):
+            with open(self.info_path) as f:
+                info = json.load(f)
+            self.dim = info['dim']
+            self.dtype = np.dtype(info['dtype'])
+
+        try:
+            stat = os.stat(self.records_path)
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and self.records_inode not in (None, stat.st_ino):
+            # Compacted by another process, which renumbered the rows
+            self._reset()
+
+        first_row = len(self.ids)
+        if stat is not None and stat.st_size > self.records_size:
+            with open(self.records_path, 'rb') as f:
+                f.seek(self.records_size)
+                data = f.read(stat.st_size - self.records_size)
+            # A line without its newline is still being written (or was interrupted)
+            data = data[:data.rfind(b'\n') + 1]
+            retired = []
+            offset = self.records_size
+            for line in data.splitlines(keepends=True):
+                record = json.loads(line)
+                if 'delete' in record:
+                    old_row = self.rows.pop(record['delete'], None)
+                else:
+                    old_row = self.rows.get(record['id'])
+                    self.rows[record['id']] = len(self.ids)
+                    self.ids.append(record['id'])
+                    self.offsets.append(offset)
+                if old_row is not None:
+                    retired.append(old_row)
+                offset += len(line)
+            self.records_size = offset
+            self.live = np.concatenate([self.live, np.ones(len(self.ids) - first_row, dtype=bool)])
+            self.live[retired] = False
+        if stat is not None:
+            self.records_inode = stat.st_ino
+
+        if len(self.ids) > first_row:
+            self._remap()
+        self._refresh_ivf(first_row)
+
+    def _refresh_ivf(self, first_row):
+        try:
+            stat = os.stat(self.ivf_path)
+            signature = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            signature = None
+        if signature is not None and signature != self.ivf_signature:
+            ivf = np.load(self.ivf_path)
+            self.centroids = ivf['centroids']
+            self.trained_size = int(ivf['trained_size'])
+            assignments = ivf['assignments']
+            self.assignments = np.full(len(self.ids), -1, dtype=np.int32)
+            self.assignments[:len(assignments)] = assignments[:len(self.ids)]
+            unassigned = np.nonzero(self.assignments < 0)[0]
+            if len(unassigned):
+                self.assignments[unassigned] = self._nearest_centroids(unassigned)
+            self._build_lists()
+            self.ivf_signature = signature
+        elif self.centroids is not None and len(self.ids) > first_row:
+            self._assign_rows(first_row)
+
+    def _assign_rows(self, first_row):
+        """Adds rows from first_row on to their nearest IVF lists."""
+        new_rows = np.arange(first_row, len(self.ids))
+        new_assignments = self._nearest_centroids(new_rows)
+        self.assignments = np.concatenate([self.assignments, new_assignments])
+        for list_id in np.unique(new_assignments):
+            self.lists[list_id] = np.concatenate([self.lists[list_id], new_rows[new_assignments == list_id]])
+
+    def _remap(self):
+        if self.dim is None or not self.ids:
+            self.vectors = None
+            return
+        self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode='r',
+                                 shape=(len(self.ids), self.dim))
+
+    def _append_records(self, lines):
+        # Cut off a partial line left by an interrupted writer
+        with open(self.records_path, 'ab') as f:
+            f.truncate(self.records_size)
+            f.write(b''.join(lines))
+        self.records_size += sum(len(line) for line in lines)
+        self.records_inode = os.stat(self.records_path).st_ino
+
+    def upsert(self, vectors):
+        if not vectors:
+            return
+        values = np.asarray([v['values'] for v in vectors], dtype=np.float32)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values = values / np.maximum(norms, 1e-12)
+
+        with self._locked(exclusive=True):
+            self._refresh()
+            if self.dim is None:
+                self.dim = values.shape[1]
+                with open(self.info_path, 'w') as f:
+                    json.dump({'dim': self.dim, 'dtype': self.dtype.name}, f)
+            if values.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match store dimension {self.dim}")
+
+            first_row = len(self.ids)
+            with open(self.vectors_path, 'ab') as f:
+                # Drops vectors of an interrupted upsert whose records were never written
+                f.truncate(first_row * self.dim * self.dtype.itemsize)
+                f.write(values.astype(self.dtype).tobytes())
+
+            self.live = np.concatenate([self.live, np.zeros(len(vectors), dtype=bool)])
+            offset = self.records_size
+            lines = []
+            for row, vector in enumerate(vectors, start=first_row):
+                line = (json.dumps({'id': vector['id'], 'metadata': vector.get('metadata') or {}}) + '\n').encode('utf-8')
+                lines.append(line)
+                old_row = self.rows.get(vector['id'])
+                if old_row is not None:
+                    self.live[old_row] = False
+                self.rows[vector['id']] = row
+                self.live[row] = True
+                self.ids.append(vector['id'])
+                self.offsets.append(offset)
+                offset += len(line)
+            self._append_records(lines)
+
+            self._remap()
+            if self.centroids is not None:
+                self._assign_rows(first_row)
+            live_count = len(self.rows)
+            needs_training = live_count >= self.min_train_size and live_count >= 2 * self.trained_size
+
+        if needs_training:
+            self.train()
+
+    def delete(self, ids):
+        with self._locked(exclusive=True):
+            self._refresh()
+            deleted = [i for i in ids if i in self.rows]
+            if not deleted:
+                return
+            for vector_id in deleted:
+                self.live[self.rows.pop(vector_id)] = False
+            self._append_records([(json.dumps({'delete': vector_id}) + '\n').encode('utf-8') for vector_id in deleted])
+
+    def query(self, vector, top_k, include_metadata):
+        with self._locked(exclusive=False):
+            self._refresh()
+            if self.vectors is None or not self.rows:
+                return {'matches': []}
+            q = np.asarray(vector, dtype=np.float32)
+            q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+            if self.centroids is not None:
+                probe = np.argsort(self.centroids @ q)[::-1][:self.nprobe]
+                candidates = np.concatenate([self.lists[list_id] for list_id in probe])
+                candidates = np.sort(candidates[self.live[candidates]])
+            else:
+                candidates = np.nonzero(self.live)[0]
+            if not len(candidates):
+                return {'matches': []}
+
+            scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ q
+            top_k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-scores[top])]
+
+            matches = []
+            with open(self.records_path, 'rb') as f:
+                for i in top:
+                    row = int(candidates[i])
+                    metadata = {}
+                    if include_metadata:
+                        f.seek(self.offsets[row])
+                        metadata = json.loads(f.readline()).get('metadata', {})
+                    matches.append({'id': self.ids[row], 'score': float(scores[i]), 'metadata': metadata})
+            return {'matches': matches}
+
+    def fetch(self, ids):
+        with self._locked(exclusive=False):
+            self._refresh()
+            vectors = {}
+            if not self.rows:
+                return vectors
+            with open(self.records_path, 'rb') as f:
+                for vector_id in ids:
+                    row = self.rows.get(vector_id)
+                    if row is None:
+                        continue
+                    f.seek(self.offsets[row])
+                    vectors[vector_id] = {
+                        'values': np.asarray(self.vectors[row], dtype=np.float32).tolist(),
+                        'metadata': json.loads(f.readline()).get('metadata', {})
+                    }
+            return vectors
+
+    def train(self, iterations=10, seed=0):
+        """
+        Trains IVF centroids with spherical k-means over a sample of live rows.
+
+        The k-means runs on a snapshot of the rows without holding the lock,
+        so queries and upserts continue meanwhile; the new index is swapped in
+        afterwards, with rows added during training assigned to it then.
+        """
+        with self.lock:
+            if self.training or not self.rows:
+                return
+            self.training = True
+            generation = self.generation
+            vectors = self.vectors
+            snapshot_rows = len(self.ids)
+            live_rows = np.nonzero(self.live)[0]
+
+        try:
+            nlist = max(1, min(int(4 * np.sqrt(len(live_rows))), 65536))
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(live_rows, size=min(len(live_rows), nlist * 64), replace=False)
+            data = np.asarray(vectors[np.sort(sample)], dtype=np.float32)
+            centroids = data[rng.choice(len(data), size=nlist, replace=False)]
+
+            for _ in range(iterations):
+                labels = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, data)
+                empty = np.bincount(labels, minlength=nlist) == 0
+                sums[empty] = centroids[empty]
+                centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+            centroids = centroids.astype(np.float32)
+            assignments = self._nearest_centroids(np.arange(snapshot_rows), centroids, vectors)
+
+            with self._locked(exclusive=True):
+                self._refresh()
+                if self.generation != generation:
+                    # Compacted meanwhile; the snapshot's row numbers no longer apply
+                    return
+                self.centroids = centroids
+                self.assignments = assignments
+                self.trained_size = len(live_rows)
+                self._build_lists()
+                if len(self.ids) > snapshot_rows:
+                    self._assign_rows(snapshot_rows)
+                tmp_path = f"{self.ivf_path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, centroids=self.centroids, assignments=self.assignments,
+                             trained_size=self.trained_size)
+                os.replace(tmp_path, self.ivf_path)
+                stat = os.stat(self.ivf_path)
+                self.ivf_signature = (stat.st_ino, stat.st_mtime_ns)
+        finally:
+            with self.lock:
+                self.training = False
+
+    def _nearest_centroids(self, rows, centroids=None, vectors=None, block_size=65536):
+        centroids = self.centroids if centroids is None else centroids
+        vectors = self.vectors if vectors is None else vectors
+        assignments = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), block_size):
+            block = np.asarray(vectors[rows[start:start + block_size]], dtype=np.float32)
+            assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def _build_lists(self):
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def compact(self):
+        """Rewrites the namespace files keeping only live rows."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            live_rows = sorted(self.rows.values())
+            tmp_vectors = self.vectors_path + '.tmp'
+            tmp_records = self.records_path + '.tmp'
+            with open(tmp_vectors, 'wb') as vf, open(tmp_records, 'wb') as rf, open(self.records_path, 'rb') as src:
+                for row in live_rows:
+                    vf.write(np.asarray(self.vectors[row]).tobytes())
+                    src.seek(self.offsets[row])
+                    rf.write(src.readline())
+            self.vectors = None
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_records, self.records_path)
+            if os.path.exists(self.ivf_path):
+                os.remove(self.ivf_path)
+
+            self._reset()
+            self._refresh()
+        if len(self.rows) >= self.min_train_size:
+            self.train()
+
+
+class LocalVectorStore(VectorStore):
+    """
+    On-disk vector store for offline use, one directory per namespace.
+
+    Vectors live in a memory-mapped float32 or float16 matrix and are searched
+    with cosine similarity. Small namespaces are scanned exactly; once a
+    namespace reaches min_train_size vectors an IVF index is trained and only
+    the nprobe closest lists are scanned. The index is retrained whenever the
+    namespace doubles in size.
+    """
+
+    def __init__(self, path=None, dtype=None, nprobe=None, min_train_size=4096):
+        self.path = path or os.getenv('LOCAL_VECTOR_STORE_PATH', DEFAULT_LOCAL_PATH)
+        self.dtype = dtype or os.getenv('LOCAL_VECTOR_DTYPE', 'float32')
+        self.nprobe = nprobe or int(os.getenv('LOCAL_VECTOR_NPROBE', 16))
+        self.min_train_size = min_train_size
+        self.namespaces = {}
+        self.lock = threading.Lock()
+
+    def _namespace(self, namespace):
+        # Only creating namespaces is serialized here; each namespace has its own lock
+        with self.lock:
+            if namespace not in self.namespaces:
+                self.namespaces[namespace] = _LocalNamespace(
+                    os.path.join(self.path, namespace), self.dtype, self.nprobe, self.min_train_size
+                )
+            return self.namespaces[namespace]
+
+    def upsert(self, vectors, namespace="ns1"):
+        self._namespace(namespace).upsert(vectors)
+
+    def query(self, vector, top_k=10, namespace="ns1", include_metadata=True):
+        return self._namespace(namespace).query(vector, top_k, include_metadata)
+
+    def fetch(self, ids, namespace="ns1"):
+        return self._namespace(namespace).fetch(ids)
+
+    def delete(self, ids, namespace="ns1"):
+        self._namespace(namespace).delete(ids)
+
+    def compact(self, namespace="ns1"):
+        self._namespace(namespace).compact()
+
+
+def create_vector_store(backend=None):
+    """Creates the vector store selected by the VECTOR_STORE env var (pinecone or local)."""
+    backend = (backend or os.getenv('VECTOR_STORE', 'pinecone')).lower()
+    if backend == 'pinecone':
+        return PineconeVectorStore()
+    if backend == 'local':
+        return LocalVectorStore()
+    raise ValueError(f"Unknown vector store backend: {backend}. Choose from: pinecone, local")
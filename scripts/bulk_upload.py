@@ -1,13 +1,17 @@
+import argparse
+import functools
+import logging
 import os
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
-import io
 
 # Add project root to Python path to import core modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.catalog import RemoteCatalog
 from core.embedding import EmbeddingManager
-from core.utils import extract_text_from_pdf, split_text
+from core.pipeline import PdfSource, ProgressReporter
+from core.utils import extract_pages_from_pdf, split_text
 
 load_dotenv()
 
@@ -15,45 +19,85 @@ load_dotenv()
 current_dir = Path(__file__).parent.parent
 directory_path = current_dir / "knowledge_base"
 
-def upload_pdfs_in_directory(directory_path, namespace="ns1"):
-    """Process and upload all PDFs in a directory to Pinecone."""
-    embedding_manager = EmbeddingManager()
-    total_chunks_uploaded = 0
-    
-    # Traverse the directory and subdirectories for PDF files
+def iter_pdf_files(directory_path):
+    """Yields a lazily opened PdfSource for every PDF under directory_path."""
     for root, dirs, files in os.walk(directory_path):
-        pdf_files = []
-        for file in files:
+        dirs.sort()
+        for file in sorted(files):
             if file.endswith('.pdf'):
-                file_path = Path(os.path.join(root, file))
-                # Read the file content
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                # Create BytesIO object with the content
-                pdf_file = io.BytesIO(content)
-                # Add name attribute to the BytesIO object
-                setattr(pdf_file, 'name', file)
-                pdf_files.append(pdf_file)
-                print(f"Processing {file}...")
-        
-        if pdf_files:
-            # Process batch of PDFs
-            chunks_per_file = embedding_manager.process_pdfs_and_upload(
-                pdf_files,
-                extract_text_from_pdf,
-                split_text,
-                namespace
-            )
-            
-            # Sum up total chunks
-            total_chunks_uploaded += sum(chunks_per_file.values())
-            
-            # Print results for each file
-            for filename, chunk_count in chunks_per_file.items():
-                print(f"Processed {filename}: {chunk_count} chunks")
-    
-    return total_chunks_uploaded
+                yield PdfSource(os.path.join(root, file))
+
+def upload_pdfs_in_directory(directory_path, namespace="ns1", force=False, max_in_flight=None,
+                             chunk_size=512, chunk_overlap=0, catalog_path=None, collection=None):
+    """
+    Process and upload all PDFs in a directory to the vector store.
+
+    Files are opened lazily as the pipeline asks for them, so peak memory
+    depends on max_in_flight (parsed documents waiting to be embedded) rather
+    than on the size of the directory. Files recorded in the ingestion manifest
+    with the same content hash and model are skipped unless force is set.
+    Extracted pages are cached, so re-running with force and a new chunk_size
+    only re-splits and re-embeds.
+
+    With catalog_path, only PDFs the scraper's remote catalog lists as
+    downloaded but not yet ingested are processed, and they are marked as
+    ingested afterwards.
+
+    With collection, the vectors go to that collection's namespace instead of
+    namespace.
+    """
+    embedding_manager = EmbeddingManager()
+    reporter = ProgressReporter()
+    catalog = RemoteCatalog(catalog_path) if catalog_path else None
+    if catalog:
+        pending_paths = catalog.pending_ingest()
+        print(f"{len(pending_paths)} new or changed PDFs in the catalog")
+        pdf_files = (PdfSource(path) for path in pending_paths)
+    else:
+        pdf_files = iter_pdf_files(directory_path)
+
+    chunks_per_file = embedding_manager.process_pdfs_and_upload(
+        pdf_files,
+        extract_pages_from_pdf,
+        functools.partial(split_text, max_chunk_size=chunk_size, chunk_overlap=chunk_overlap),
+        namespace,
+        collection=collection,
+        force=force,
+        on_file_done=reporter,
+        queue_size=max_in_flight
+    )
+
+    if catalog:
+        catalog.mark_ingested(path for path in pending_paths if os.path.basename(path) in chunks_per_file)
+        catalog.close()
+
+    counts = reporter.counts
+    print(f"Files: {counts['ingested']} processed, {counts['skipped']} unchanged, {counts['failed']} failed")
+    return sum(chunks_per_file.values())
 
 if __name__ == "__main__":
-    uploaded_chunks = upload_pdfs_in_directory(directory_path)
+    parser = argparse.ArgumentParser(description="Process and upload PDFs from knowledge_base.")
+    parser.add_argument('--force', action='store_true',
+                        help="Re-embed every file, even if unchanged since the last run")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="Maximum parsed documents held in memory (default: twice the parse workers)")
+    parser.add_argument('--chunk-size', type=int, default=512, help="Maximum characters per chunk")
+    parser.add_argument('--chunk-overlap', type=int, default=0, help="Characters shared by consecutive chunks")
+    parser.add_argument('--from-catalog', nargs='?', const=str(directory_path / 'remote_catalog.sqlite'),
+                        help="Only ingest files the scraper catalog lists as not yet ingested")
+    parser.add_argument('--collection', default=None,
+                        help="Collection to add the files to, as configured in COLLECTIONS (default: default)")
+    args = parser.parse_args()
+
+    # Surfaces upsert retries and the throughput summary logged by the pipeline
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    uploaded_chunks = upload_pdfs_in_directory(
+        directory_path,
+        force=args.force,
+        max_in_flight=args.max_in_flight,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        catalog_path=args.from_catalog,
+        collection=args.collection
+    )
     print(f"Total chunks uploaded: {uploaded_chunks}")
@@ -0,0 +1,41 @@
+import argparse
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+
+# Add project root to Python path to import core modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.embedding_service import DEFAULT_SERVICE_URL, EmbeddingService
+from core.inference import BACKENDS, TextEncoder
+
+load_dotenv()
+
+def serve(url, backend, threads, batch_size=32, max_wait_ms=2.0):
+    encoder = TextEncoder(os.getenv('MODEL_NAME'), backend, num_threads=threads)
+    server = EmbeddingService(encoder, batch_size, max_wait_ms).make_server(url)
+    print(f"Serving {encoder.model_name} ({backend}, {threads} threads) on {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run one embedding model shared by every app worker on this machine."
+    )
+    parser.add_argument('--url', default=os.getenv('EMBEDDING_SERVICE_URL', DEFAULT_SERVICE_URL),
+                        help="http://host:port or unix:///path/to.sock")
+    parser.add_argument('--backend', choices=BACKENDS, default=os.getenv('EMBEDDING_BACKEND', 'torch'))
+    parser.add_argument('--threads', type=int,
+                        default=int(os.getenv('EMBEDDING_SERVICE_THREADS', os.cpu_count() or 1)),
+                        help="Intra-op threads for the forward pass")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help="How long to wait for concurrent requests to merge into one forward pass")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    serve(args.url, args.backend, args.threads, args.batch_size, args.max_wait_ms)
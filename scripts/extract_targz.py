@@ -1,31 +1,154 @@
+import argparse
+import io
+import logging
+import multiprocessing
 import os
+import sys
 import tarfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def extract_pdf_from_tar_gz(source_dir, target_dir):
+# Add project root to Python path to import core modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.embedding import EmbeddingManager
+from core.pipeline import ProgressReporter
+from core.utils import extract_pages_from_pdf, split_text
+
+def find_archives(source_dir):
+    """Returns the paths of all .tar.gz files under source_dir."""
+    archives = []
+    for root, _, files in os.walk(source_dir):
+        for filename in sorted(files):
+            if filename.endswith('.tar.gz'):
+                archives.append(os.path.join(root, filename))
+    return archives
+
+def iter_pdfs_in_archive(tar_gz_path):
+    """
+    Yields (member name, bytes) for each PDF in a tar.gz, in archive order.
+
+    The archive is read as a stream ('r|gz'), one member at a time, without
+    building the member index that getmembers() needs.
+    """
+    with tarfile.open(tar_gz_path, 'r|gz') as tar:
+        for member in tar:
+            if member.isfile() and member.name.endswith('.pdf'):
+                yield member.name, tar.extractfile(member).read()
+
+def extract_archive(tar_gz_path, target_dir):
+    """Extracts the PDFs of one archive under target_dir; returns how many were extracted."""
+    extracted = 0
+    with tarfile.open(tar_gz_path, 'r|gz') as tar:
+        for member in tar:
+            if member.isfile() and member.name.endswith('.pdf'):
+                # Define the path to extract the PDF to the target directory
+                pdf_path = os.path.join(target_dir, os.path.basename(member.name))
+                print(f'Extracting {pdf_path}')
+                tar.extract(member, path=target_dir)
+                extracted += 1
+    return extracted
+
+def extract_pdf_from_tar_gz(source_dir, target_dir, workers=None):
+    """Extracts the PDFs of every tar.gz under source_dir, several archives at a time."""
     # Create the target directory if it doesn't exist
     if not os.path.exists(target_dir):
         os.makedirs(target_dir)
-    
-    # Recursively search for .tar.gz files in the source directory
-    for root, _, files in os.walk(source_dir):
-        for filename in files:
-            if filename.endswith('.tar.gz'):
-                tar_gz_path = os.path.join(root, filename)
-                
-                try:
-                    # Open the tar.gz file
-                    with tarfile.open(tar_gz_path, 'r:gz') as tar:
-                        # Extract only .pdf files
-                        for member in tar.getmembers():
-                            if member.name.endswith('.pdf'):
-                                # Define the path to extract the PDF to the target directory
-                                pdf_path = os.path.join(target_dir, os.path.basename(member.name))
-                                print(f'Extracting {pdf_path}')
-                                tar.extract(member, path=target_dir)
-                except Exception as e:
-                    print(f"Error extracting from {filename}: {e}")
+
+    archives = find_archives(source_dir)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(extract_archive, path, target_dir): path for path in archives}
+        for future in as_completed(futures):
+            filename = os.path.basename(futures[future])
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error extracting from {filename}: {e}")
+
+def _read_archives(tasks, output):
+    """Reader process: streams PDFs from archives taken off tasks into output."""
+    while True:
+        tar_gz_path = tasks.get()
+        if tar_gz_path is None:
+            break
+        try:
+            for name, data in iter_pdfs_in_archive(tar_gz_path):
+                output.put((tar_gz_path, name, data, None))
+        except Exception as e:
+            output.put((tar_gz_path, None, None, str(e)))
+    output.put(None)
+
+def stream_pdfs_from_archives(archives, workers=None, max_buffered=32):
+    """
+    Yields in-memory PDF files (BytesIO named after the member's base name)
+    from several archives at once.
+
+    Each reader process decompresses one archive at a time; at most
+    max_buffered PDFs wait in memory for the consumer.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(archives)))
+    tasks = multiprocessing.Queue()
+    output = multiprocessing.Queue(maxsize=max_buffered)
+    for path in archives:
+        tasks.put(path)
+    for _ in range(workers):
+        tasks.put(None)
+
+    readers = [multiprocessing.Process(target=_read_archives, args=(tasks, output), daemon=True)
+               for _ in range(workers)]
+    for reader in readers:
+        reader.start()
+    try:
+        finished = 0
+        while finished < workers:
+            item = output.get()
+            if item is None:
+                finished += 1
+                continue
+            tar_gz_path, name, data, error = item
+            if error:
+                print(f"Error reading {os.path.basename(tar_gz_path)}: {error}")
+                continue
+            pdf_file = io.BytesIO(data)
+            pdf_file.name = os.path.basename(name)
+            yield pdf_file
+    finally:
+        for reader in readers:
+            # Readers may be blocked on a full queue if the consumer stopped early
+            if finished < workers:
+                reader.terminate()
+            reader.join()
+
+def ingest_pdf_from_tar_gz(source_dir, namespace="ns1", workers=None, force=False, collection=None):
+    """Streams the PDFs of every tar.gz under source_dir straight into ingestion, without writing them to disk."""
+    embedding_manager = EmbeddingManager()
+    reporter = ProgressReporter()
+    chunks_per_file = embedding_manager.process_pdfs_and_upload(
+        stream_pdfs_from_archives(find_archives(source_dir), workers),
+        extract_pages_from_pdf,
+        split_text,
+        namespace,
+        collection=collection,
+        force=force,
+        on_file_done=reporter
+    )
+    counts = reporter.counts
+    print(f"Files: {counts['ingested']} processed, {counts['skipped']} unchanged, {counts['failed']} failed")
+    return sum(chunks_per_file.values())
 
 if __name__ == '__main__':
-    source_dir = 'knowledge_base/NLM'  # Source directory with tar.gz files
-    target_dir = 'knowledge_base/NLM_PDFs'  # Target directory for extracted PDFs
-    extract_pdf_from_tar_gz(source_dir, target_dir)
+    parser = argparse.ArgumentParser(description="Extract or directly ingest the PDFs in NLM tar.gz archives.")
+    parser.add_argument('--source-dir', default='knowledge_base/NLM', help="Directory with tar.gz files")
+    parser.add_argument('--target-dir', default='knowledge_base/NLM_PDFs', help="Target directory for extracted PDFs")
+    parser.add_argument('--ingest', action='store_true',
+                        help="Stream PDFs from the archives into the vector store instead of extracting them")
+    parser.add_argument('--workers', type=int, default=None, help="Archives read in parallel (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="With --ingest, re-embed files even if unchanged")
+    parser.add_argument('--collection', default=None, help="With --ingest, the collection to add the files to")
+    args = parser.parse_args()
+
+    if args.ingest:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        uploaded_chunks = ingest_pdf_from_tar_gz(args.source_dir, workers=args.workers, force=args.force,
+                                                 collection=args.collection)
+        print(f"Total chunks uploaded: {uploaded_chunks}")
+    else:
+        extract_pdf_from_tar_gz(args.source_dir, args.target_dir, args.workers)
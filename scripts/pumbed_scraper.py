@@ -1,11 +1,98 @@
 import ftplib
 import os
+import queue
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime
 import logging
 from pathlib import Path
 import concurrent.futures
 import re
+import sys
+
+# Add project root to Python path to import core modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.catalog import RemoteCatalog
+
+# Transient FTP replies (e.g. 421 too many connections, 450 busy) slow the crawl down
+TRANSIENT_ERRORS = (ftplib.error_temp, EOFError, ConnectionError, TimeoutError)
+
+class FTPConnectionPool:
+    """Logged-in FTP connections shared by the worker threads."""
+
+    def __init__(self, connect, size):
+        self.connect = connect
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Yields an idle connection, or a new one while fewer than size are open."""
+        self.slots.acquire()
+        try:
+            try:
+                ftp = self.idle.get_nowait()
+            except queue.Empty:
+                ftp = self.connect()
+            try:
+                yield ftp
+            except BaseException:
+                # The control connection may be mid-reply; don't hand it out again
+                self._close(ftp)
+                raise
+            self.idle.put(ftp)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._close(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _close(ftp):
+        try:
+            ftp.quit()
+        except Exception:
+            ftp.close()
+
+class AdaptiveRateLimiter:
+    """
+    Spaces out requests across all threads.
+
+    The delay between requests starts at min_delay, doubles (up to max_delay)
+    whenever the server answers with a transient error and decays again as
+    requests succeed.
+    """
+
+    def __init__(self, min_delay=0.0, max_delay=10.0, backoff=2.0, decay=0.9):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.decay = decay
+        self.delay = min_delay
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def success(self):
+        with self.lock:
+            self.delay = max(self.min_delay, self.delay * self.decay)
+
+    def failure(self):
+        with self.lock:
+            self.delay = min(self.max_delay, max(self.delay * self.backoff, 0.5))
 
 class PMCScraper:
     # Define available sources and their paths
@@ -14,15 +101,23 @@ class PMCScraper:
         'NLM': '/pub/litarch'
     }
 
-    def __init__(self, base_dir="knowledge_base", source="PMC"):
-        self.ftp_host = "ftp.ncbi.nlm.nih.gov"
+    def __init__(self, base_dir="knowledge_base", source="PMC", ftp_host="ftp.ncbi.nlm.nih.gov",
+                 ftp_port=21, max_connections=4, catalog=None):
+        self.ftp_host = ftp_host
+        self.ftp_port = ftp_port
         if source not in self.SOURCES:
             raise ValueError(f"Invalid source. Choose from: {', '.join(self.SOURCES.keys())}")
         self.source = source
         self.base_path = self.SOURCES[source]
         self.base_dir = Path(base_dir)
         self.source_dir = self.base_dir / source  # Create source-specific directory path
+        self.pool = FTPConnectionPool(self.connect_ftp, max_connections)
+        self.rate_limiter = AdaptiveRateLimiter()
+        # Set to False on the first server that rejects MLSD
+        self.mlsd_supported = True
         self.setup_logging()
+        # Remote paths, sizes and modify times from earlier crawls, used to skip unchanged work
+        self.catalog = catalog or RemoteCatalog(self.base_dir / 'remote_catalog.sqlite')
         
     def setup_logging(self):
         """Configure logging to both file and console."""
@@ -40,123 +135,213 @@ class PMCScraper:
     def connect_ftp(self):
         """Establish FTP connection with error handling."""
         try:
-            ftp = ftplib.FTP(self.ftp_host)
+            ftp = ftplib.FTP()
+            ftp.connect(self.ftp_host, self.ftp_port, timeout=60)
             ftp.login()  # anonymous login
             return ftp
         except ftplib.all_errors as e:
             logging.error(f"FTP connection failed: {str(e)}")
             raise
             
+    def request(self, func, *args, **kwargs):
+        """Runs one FTP command under the rate limiter, which backs off on transient errors."""
+        self.rate_limiter.wait()
+        try:
+            result = func(*args, **kwargs)
+        except TRANSIENT_ERRORS:
+            self.rate_limiter.failure()
+            raise
+        self.rate_limiter.success()
+        return result
+
+    def list_entries(self, ftp, path):
+        """
+        Lists a directory as (name, facts) pairs in one round trip.
+
+        facts has 'type' ('dir' or 'file'), 'size' (int or None) and 'modify'
+        (the MLSD YYYYMMDDHHMMSS timestamp, or the LIST date text). Uses MLSD
+        and falls back to parsing LIST output on servers that lack it.
+        """
+        if self.mlsd_supported:
+            try:
+                entries = self.request(lambda: list(ftp.mlsd(path, facts=['type', 'size', 'modify'])))
+                return [
+                    (name, {
+                        'type': 'dir' if facts.get('type') == 'dir' else 'file',
+                        'size': int(facts['size']) if 'size' in facts else None,
+                        'modify': facts.get('modify')
+                    })
+                    for name, facts in entries
+                    if facts.get('type') not in ('cdir', 'pdir') and name not in ('.', '..')
+                ]
+            except ftplib.error_perm as e:
+                if not str(e).startswith(('500', '501', '502')):
+                    raise
+                logging.info(f"Server does not support MLSD ({e}); falling back to LIST")
+                self.mlsd_supported = False
+
+        lines = []
+        self.request(ftp.dir, path, lines.append)
+        return [entry for entry in map(self.parse_list_line, lines) if entry]
+
+    @staticmethod
+    def parse_list_line(line):
+        """Parses one Unix-style LIST line into (name, facts), or None for lines that are not entries."""
+        parts = line.split(None, 8)
+        if len(parts) < 9 or parts[8] in ('.', '..'):
+            return None
+        name = parts[8]
+        if line.startswith('l'):
+            name = name.split(' -> ')[0]
+        return name, {
+            'type': 'dir' if line.startswith('d') else 'file',
+            'size': int(parts[4]) if parts[4].isdigit() else None,
+            'modify': ' '.join(parts[5:8])
+        }
+
     def get_subdirectories(self, ftp, path):
-        """List all subdirectories in the given FTP path."""
+        """List all subdirectories in the given FTP path as (name, modify) pairs."""
         try:
-            dirs = []
-            ftp.cwd(path)
-            ftp.dir(lambda x: dirs.append(x.split()[-1]))
-            return [d for d in dirs if re.match(r'^[0-9a-f]{2}$', d)]
+            return sorted((name, facts['modify']) for name, facts in self.list_entries(ftp, path)
+                          if facts['type'] == 'dir' and re.match(r'^[0-9a-f]{2}$', name))
         except ftplib.all_errors as e:
             logging.error(f"Failed to get subdirectories for {path}: {str(e)}")
             return []
-            
-    def download_file(self, ftp, remote_path, local_path):
-        """Download a single file."""
+
+    def download_file(self, ftp, remote_path, local_path, remote_size=None):
+        """
+        Download a single file, resuming an interrupted transfer.
+
+        Data goes to a .part file that is renamed once its size matches
+        remote_size (when known), so a partial file is never mistaken for a
+        complete one. An existing .part file is continued with REST.
+        """
+        part_path = local_path.with_name(local_path.name + '.part')
         try:
             local_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(local_path, 'wb') as f:
-                ftp.retrbinary(f'RETR {remote_path}', f.write)
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            if remote_size is not None and offset > remote_size:
+                offset = 0
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                if remote_size is None or offset < remote_size:
+                    self.request(ftp.retrbinary, f'RETR {remote_path}', f.write, rest=offset or None)
+
+            size = part_path.stat().st_size
+            if remote_size is not None and size != remote_size:
+                logging.error(f"Incomplete download of {remote_path}: {size} of {remote_size} bytes")
+                return False
+            os.replace(part_path, local_path)
             return True
         except ftplib.all_errors as e:
             logging.error(f"Failed to download {remote_path}: {str(e)}")
-            return False
-            
-    def is_directory(self, ftp, name):
-        """Check if the item is a directory."""
-        current = ftp.pwd()
-        try:
-            ftp.cwd(name)
-            ftp.cwd(current)
-            return True
-        except ftplib.error_perm:
-            return False
+            raise
 
-    def list_files_recursive(self, ftp, path):
-        """Recursively list all files in the directory and its subdirectories."""
+    def list_files_recursive(self, ftp, path, modify=None):
+        """
+        Lists all files under a directory as (remote path, facts) pairs, one listing per directory.
+
+        Leaf directories whose modify time matches the catalog are not listed
+        again; their files come from the catalog. Fresh listings are recorded
+        in it.
+        """
         files = []
-        directories = []
-        
-        try:
-            ftp.cwd(path)
-            items = []
-            ftp.dir(lambda x: items.append(x.split()[-1]))
-            
-            for item in items:
-                if item in ['.', '..']:
-                    continue
-                    
-                full_path = f"{path}/{item}"
-                if self.is_directory(ftp, item):
-                    directories.append(full_path)
+        pending = [(path, modify)]
+        while pending:
+            directory, directory_modify = pending.pop()
+            if self.catalog.is_unchanged_leaf(self.source, directory, directory_modify):
+                files.extend(self.catalog.files_in(self.source, directory))
+                continue
+            try:
+                entries = self.list_entries(ftp, directory)
+            except ftplib.error_perm as e:
+                logging.error(f"Permission error accessing {directory}: {str(e)}")
+                continue
+            listed = []
+            for name, facts in entries:
+                full_path = f"{directory}/{name}"
+                if facts['type'] == 'dir':
+                    pending.append((full_path, facts['modify']))
                 else:
-                    files.append(full_path)
-            
-            # Recursively process subdirectories
-            for directory in directories:
-                files.extend(self.list_files_recursive(ftp, directory))
-                
-            return files
-            
-        except ftplib.error_perm as e:
-            logging.error(f"Permission error accessing {path}: {str(e)}")
-            return []
-            
-    def process_directory(self, subdir):
+                    listed.append((full_path, facts))
+            is_leaf = len(listed) == len(entries)
+            self.catalog.record_listing(self.source, directory, directory_modify, listed, is_leaf)
+            files.extend(listed)
+        return files
+
+    def is_complete(self, local_path, remote_size):
+        """True when a local file exists and matches the remote size (when known)."""
+        if not local_path.exists():
+            return False
+        return remote_size is None or local_path.stat().st_size == remote_size
+
+    def process_directory(self, subdir, modify=None):
         """Process a directory and its subdirectories."""
         try:
-            ftp = self.connect_ftp()
             dir_path = f"{self.base_path}/{subdir}"
             local_dir = self.source_dir / subdir  # Use source-specific directory
-            
+
             # Get list of all files recursively
-            files = self.list_files_recursive(ftp, dir_path)
-            
+            with self.pool.connection() as ftp:
+                files = self.list_files_recursive(ftp, dir_path, modify)
+
             # Download each file
             downloaded = 0
-            for remote_path in files:
+            for remote_path, facts in files:
                 # Convert remote path to local path structure
                 relative_path = remote_path.replace(dir_path, '')
                 local_path = local_dir / relative_path.lstrip('/')
-                
+
+                if self.is_complete(local_path, facts['size']):
+                    if self.catalog.is_downloaded(self.source, remote_path, facts['size'], facts['modify']):
+                        continue
+                    if not self.catalog.has_download_record(self.source, remote_path):
+                        # Downloaded before the catalog existed
+                        logging.info(f"Skipping existing file: {local_path}")
+                        self.catalog.mark_downloaded(self.source, remote_path, facts['size'],
+                                                     facts['modify'], local_path)
+                        continue
+                    # Same size but a new modify time: the remote file was replaced
+                    os.remove(local_path)
                 if local_path.exists():
-                    logging.info(f"Skipping existing file: {local_path}")
-                    continue
-                
-                if self.download_file(ftp, remote_path, local_path):
+                    # Left incomplete by a run from before .part files; continue it
+                    os.replace(local_path, local_path.with_name(local_path.name + '.part'))
+
+                ok = False
+                for attempt in range(3):
+                    # A failed connection is dropped from the pool; retrying resumes the .part file
+                    try:
+                        with self.pool.connection() as ftp:
+                            ok = self.download_file(ftp, remote_path, local_path, facts['size'])
+                        break
+                    except TRANSIENT_ERRORS + (OSError,):
+                        continue
+                    except ftplib.all_errors:
+                        break
+                if ok:
+                    self.catalog.mark_downloaded(self.source, remote_path, facts['size'], facts['modify'], local_path)
                     extension = Path(remote_path).suffix
                     logging.info(f"Successfully downloaded: {remote_path} (type: {extension})")
                     downloaded += 1
-                time.sleep(0.5)  # Rate limiting
-                
-            ftp.quit()
+
             return downloaded
         except Exception as e:
             logging.error(f"Error processing directory {subdir}: {str(e)}")
             return 0
-            
+
     def run(self, max_workers=4):
         """Main method to run the scraper with parallel processing."""
         try:
             # Get list of all subdirectories
-            ftp = self.connect_ftp()
-            subdirs = self.get_subdirectories(ftp, self.base_path)
-            ftp.quit()
-            
+            with self.pool.connection() as ftp:
+                subdirs = self.get_subdirectories(ftp, self.base_path)
+
             logging.info(f"Found {len(subdirs)} subdirectories to process")
-            
-            # Process directories in parallel
+
+            # Process directories in parallel; connections come from the shared pool
             with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_dir = {executor.submit(self.process_directory, subdir): subdir 
-                               for subdir in subdirs}
-                
+                future_to_dir = {executor.submit(self.process_directory, subdir, modify): subdir
+                               for subdir, modify in subdirs}
+
                 total_files = 0
                 for future in concurrent.futures.as_completed(future_to_dir):
                     subdir = future_to_dir[future]
@@ -166,12 +351,14 @@ class PMCScraper:
                         logging.info(f"Completed directory {subdir}: {files_downloaded} files")
                     except Exception as e:
                         logging.error(f"Directory {subdir} generated an exception: {str(e)}")
-            
+
             logging.info(f"Scraping completed. Total files downloaded: {total_files}")
-            
+
         except Exception as e:
             logging.error(f"Scraper failed: {str(e)}")
             raise
+        finally:
+            self.pool.close()
 
     @staticmethod
     def get_source_selection():
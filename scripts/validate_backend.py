@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+# Add project root to Python path to import core modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.inference import BACKENDS, TextEncoder
+from core.utils import extract_text_from_pdf, split_text
+
+load_dotenv()
+
+# Get the current script's directory and set knowledge_base path
+current_dir = Path(__file__).parent.parent
+directory_path = current_dir / "knowledge_base"
+
+def load_sample_chunks(corpus_dir, max_chunks):
+    """Collects up to max_chunks chunks from the PDFs under corpus_dir."""
+    chunks = []
+    for root, dirs, files in os.walk(corpus_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.endswith('.pdf'):
+                continue
+            try:
+                with open(os.path.join(root, file), 'rb') as f:
+                    chunks.extend(split_text(extract_text_from_pdf(f)))
+            except Exception as e:
+                print(f"Skipping {file}: {e}")
+            if len(chunks) >= max_chunks:
+                return chunks[:max_chunks]
+    return chunks
+
+def timed_embed(encoder, chunks, batch_size):
+    start = time.perf_counter()
+    embeddings = encoder.embed_texts(chunks, batch_size)
+    return embeddings, time.perf_counter() - start
+
+def validate(backend, chunks, batch_size=32):
+    """Embeds chunks with fp32 PyTorch and with backend; returns cosine agreement and timings."""
+    model_name = os.getenv('MODEL_NAME')
+    reference, reference_seconds = timed_embed(TextEncoder(model_name, 'torch'), chunks, batch_size)
+    candidate, candidate_seconds = timed_embed(TextEncoder(model_name, backend), chunks, batch_size)
+
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = (reference * candidate).sum(axis=1) / np.maximum(norms, 1e-12)
+    return {
+        'chunks': len(chunks),
+        'mean_cosine': float(cosines.mean()),
+        'min_cosine': float(cosines.min()),
+        'p1_cosine': float(np.percentile(cosines, 1)),
+        'p5_cosine': float(np.percentile(cosines, 5)),
+        'fp32_chunks_per_second': len(chunks) / reference_seconds,
+        f'{backend}_chunks_per_second': len(chunks) / candidate_seconds,
+        'speedup': reference_seconds / candidate_seconds
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure how closely an embedding backend agrees with fp32 PyTorch on a sample corpus."
+    )
+    parser.add_argument('backend', choices=[b for b in BACKENDS if b != 'torch'])
+    parser.add_argument('--corpus', default=str(directory_path), help="Directory of PDFs to sample")
+    parser.add_argument('--max-chunks', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--min-cosine', type=float, default=0.98,
+                        help="Exit with an error if any chunk agrees less than this")
+    args = parser.parse_args()
+
+    sample = load_sample_chunks(args.corpus, args.max_chunks)
+    if not sample:
+        sys.exit(f"No PDF text found under {args.corpus}")
+
+    report = validate(args.backend, sample, args.batch_size)
+    for key, value in report.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+    if report['min_cosine'] < args.min_cosine:
+        sys.exit(f"Minimum cosine {report['min_cosine']:.4f} is below {args.min_cosine}")
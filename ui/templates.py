@@ -31,13 +31,15 @@ def create_upload_page():
         dbc.Container([
             dbc.Card(className='card', style={'border': 'none'}, children=[
                 html.H1("Upload PDFs", className='heading'),
-                dcc.Upload(
-                    id='upload-pdf',
-                    children=html.Div([
+                # Files are sent in chunks to the /uploads routes by ui/upload.js
+                html.Div(
+                    id='upload-drop-zone',
+                    children=[
                         html.I(className="fas fa-cloud-upload-alt", 
                             style={'fontSize': '3rem', 'marginBottom': '1rem'}),
                         html.P("Drag and Drop or Click to Upload Multiple PDFs")
-                    ], style={
+                    ],
+                    style={
                         'textAlign': 'center',
                         'padding': '1rem',
                         'border': '1px solid #e0e0e0',
@@ -47,33 +49,51 @@ def create_upload_page():
                         'display': 'flex',
                         'flexDirection': 'column',
                         'justifyContent': 'center',
-                        'alignItems': 'center'
-                    }),
-                    style={'cursor': 'pointer'},
-                    multiple=True
+                        'alignItems': 'center',
+                        'cursor': 'pointer'
+                    }
                 ),
+                html.Button(id='upload-submitted', style={'display': 'none'}),
                 dbc.Progress(id="overall-progress", 
                         style={'height': '0.5rem', 'marginBottom': '1rem'}),
+                html.Div(id='upload-transfer-status'),
                 html.Div(id='upload-results'),
+                # Enabled at first so jobs still running after a reload are shown
+                dcc.Interval(id='upload-poll', interval=1000, disabled=False),
                 dbc.Button("Back", id="back-to-landing", 
                         className="button mt-3", color="secondary")
             ])
         ])
     ])
 
-def create_chat_page():
+def create_chat_page(collections=()):
     return html.Div(id='chat-page', style={'display': 'none'}, className='background', children=[
         dbc.Container([
             dbc.Card(className='card', style={'border': 'none'}, children=[
                 html.H1("Chat with AI Assistant", className='heading'),
-                html.Div(id='chat-history', style={
+                # Collections to search; none selected searches all of them
+                dcc.Dropdown(
+                    id='chat-collections',
+                    options=[{'label': name, 'value': name} for name in collections],
+                    multi=True,
+                    placeholder='All collections',
+                    style={'marginBottom': '1rem', 'display': 'block' if len(collections) > 1 else 'none'}
+                ),
+                html.Div(id='chat-window', style={
                     'height': '400px',
                     'overflowY': 'auto',
                     'padding': '1rem',
                     'border': '1px solid #e0e0e0',
                     'borderRadius': '8px',
                     'marginBottom': '1rem'
-                }),
+                }, children=[
+                    html.Div(id='chat-history'),
+                    # Answer being streamed; moved into chat-history once complete
+                    html.Div(id='chat-pending',
+                             style={'marginBottom': '1rem', 'textAlign': 'left', 'color': '#2c3e50'})
+                ]),
+                dcc.Store(id='chat-stream-id'),
+                dcc.Interval(id='chat-stream-poll', interval=100, disabled=True),
                 dbc.Row([
                     dbc.Col([
                         dbc.Input(
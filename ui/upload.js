@@ -0,0 +1,157 @@
+// Uploads PDFs to the server in chunks (see the /uploads routes in app.py), so
+// large files are never held in memory as base64 and interrupted uploads resume
+// where they stopped. Elements are looked up on each event because Dash renders
+// the page after this script has loaded.
+(function () {
+    const CHUNK_SIZE = 8 * 1024 * 1024;
+    const MAX_ATTEMPTS = 5;
+
+    function sessionId() {
+        // Kept by the dcc.Store with id 'session-id' (storage_type='session')
+        try {
+            return JSON.parse(window.sessionStorage.getItem('session-id'));
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function requestJson(method, url, body, headers) {
+        const response = await fetch(url, {method: method, body: body, headers: headers});
+        const data = await response.json().catch(() => ({}));
+        return {status: response.status, data: data};
+    }
+
+    function resumeKey(file) {
+        return `upload:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    async function startOrResume(file) {
+        const stored = window.localStorage.getItem(resumeKey(file));
+        if (stored) {
+            const {status, data} = await requestJson('GET', `/uploads/${stored}`);
+            if (status === 200) {
+                return {id: stored, offset: data.offset};
+            }
+        }
+        const {status, data} = await requestJson('POST', '/uploads',
+            JSON.stringify({filename: file.name, size: file.size}), {'Content-Type': 'application/json'});
+        if (status !== 201) {
+            throw new Error(data.error || `HTTP ${status}`);
+        }
+        window.localStorage.setItem(resumeKey(file), data.id);
+        return {id: data.id, offset: data.offset};
+    }
+
+    async function uploadFile(file, onProgress) {
+        let {id, offset} = await startOrResume(file);
+        let attempts = 0;
+        onProgress(offset);
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + CHUNK_SIZE);
+            try {
+                const {status, data} = await requestJson('PUT', `/uploads/${id}?offset=${offset}`, chunk,
+                    {'Content-Type': 'application/octet-stream'});
+                if (status === 200 || status === 409) {
+                    // On 409 the server says where to continue from
+                    offset = data.offset;
+                    attempts = 0;
+                    onProgress(offset);
+                    continue;
+                }
+                throw new Error(data.error || `HTTP ${status}`);
+            } catch (e) {
+                attempts += 1;
+                if (attempts >= MAX_ATTEMPTS) {
+                    throw e;
+                }
+                await sleep(500 * 2 ** attempts);
+                const {status, data} = await requestJson('GET', `/uploads/${id}`).catch(() => ({}));
+                if (status === 200) {
+                    offset = data.offset;
+                }
+            }
+        }
+        return id;
+    }
+
+    function statusLine(container, text, color) {
+        const line = document.createElement('div');
+        line.className = `alert alert-${color}`;
+        line.style.marginBottom = '0.5rem';
+        line.textContent = text;
+        container.appendChild(line);
+        return line;
+    }
+
+    async function uploadFiles(files) {
+        const container = document.getElementById('upload-transfer-status');
+        container.replaceChildren();
+        const uploadIds = [];
+        for (const file of files) {
+            const line = statusLine(container, `↑ ${file.name}: starting`, 'secondary');
+            try {
+                const id = await uploadFile(file, offset => {
+                    const percent = file.size ? Math.floor(100 * offset / file.size) : 100;
+                    line.textContent = `↑ ${file.name}: ${percent}% uploaded`;
+                });
+                line.textContent = `↑ ${file.name}: uploaded`;
+                uploadIds.push({id: id, file: file});
+            } catch (e) {
+                line.className = 'alert alert-danger';
+                line.textContent = `✗ ${file.name}: ${e.message}`;
+            }
+        }
+        if (!uploadIds.length) {
+            return;
+        }
+
+        const {status, data} = await requestJson('POST', '/ingest-jobs',
+            JSON.stringify({uploads: uploadIds.map(u => u.id), session: sessionId()}),
+            {'Content-Type': 'application/json'});
+        if (status !== 201) {
+            statusLine(container, `✗ Could not start ingestion: ${data.error || `HTTP ${status}`}`, 'danger');
+            return;
+        }
+        uploadIds.forEach(u => window.localStorage.removeItem(resumeKey(u.file)));
+        container.replaceChildren();
+        // Tells the Dash app to poll the new job's progress
+        document.getElementById('upload-submitted').click();
+    }
+
+    function pdfFiles(fileList) {
+        return Array.from(fileList).filter(file => file.name.toLowerCase().endsWith('.pdf'));
+    }
+
+    // Dash has no file input component, so the picker is created here
+    const picker = document.createElement('input');
+    picker.type = 'file';
+    picker.multiple = true;
+    picker.accept = '.pdf,application/pdf';
+    picker.addEventListener('change', () => {
+        uploadFiles(pdfFiles(picker.files));
+        picker.value = '';
+    });
+
+    document.addEventListener('click', event => {
+        if (event.target.closest('#upload-drop-zone')) {
+            picker.click();
+        }
+    });
+
+    document.addEventListener('dragover', event => {
+        if (event.target.closest('#upload-drop-zone')) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener('drop', event => {
+        if (event.target.closest('#upload-drop-zone')) {
+            event.preventDefault();
+            uploadFiles(pdfFiles(event.dataTransfer.files));
+        }
+    });
+})();